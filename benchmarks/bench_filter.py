@@ -0,0 +1,119 @@
+# !/usr/bin/env python3
+
+"""Compare the indexed filter engine with plain column scans.
+
+Usage: python benchmarks/bench_filter.py [rows]
+"""
+
+import sys
+from timeit import default_timer as timer
+
+import numpy as np
+import pandas as pd
+
+from datacanvas.index import FilterIndex
+
+GENDERS = ['Man', 'Woman']
+RACES = ['asian', 'indian', 'black', 'white',
+         'middle eastern', 'latino hispanic']
+EMOTIONS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'quality': rng.uniform(0, 100, rows),
+        'faces.age': rng.integers(1, 90, rows),
+        'faces.gender': rng.choice(GENDERS, rows),
+        'faces.dominant_race': rng.choice(RACES, rows),
+        'faces.dominant_emotion': rng.choice(EMOTIONS, rows),
+        'pose.yaw': rng.uniform(-90, 90, rows),
+        'pose.pitch': rng.uniform(-90, 90, rows),
+        'pose.roll': rng.uniform(-90, 90, rows),
+        'faces.iris_distance': rng.uniform(10, 400, rows),
+    })
+
+
+def scan(df, predicates):
+    mask = np.ones(len(df), bool)
+    for column, predicate in predicates.items():
+        if isinstance(predicate, tuple):
+            mask &= df[column].between(*sorted(predicate)).to_numpy()
+        else:
+            mask &= df[column].isin(predicate).to_numpy()
+    return mask
+
+
+def forget(index):
+    """Drop the masks `index` memoized, keeping its sorted columns."""
+
+    index._masks.clear()
+    index._last = None
+
+
+def best(func, repeat=5, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = timer()
+        result = func()
+        times.append(timer() - start)
+    return min(times), result
+
+
+def main(rows):
+    df = make_frame(rows)
+    queries = {
+        'defaults': {
+            'quality': (0, 100), 'faces.age': (1, 999),
+            'faces.gender': set(GENDERS), 'faces.dominant_race': set(RACES),
+            'faces.dominant_emotion': set(EMOTIONS),
+            'pose.yaw': (-90, 90), 'pose.pitch': (-90, 90),
+            'pose.roll': (-90, 90), 'faces.iris_distance': (0, 9999),
+        },
+        'typical': {
+            'quality': (40, 100), 'faces.age': (18, 60),
+            'faces.gender': {'Woman'}, 'faces.dominant_race': set(RACES[:4]),
+            'faces.dominant_emotion': {'happy', 'neutral'},
+            'pose.yaw': (-30, 30), 'pose.pitch': (-20, 20),
+            'pose.roll': (-20, 20), 'faces.iris_distance': (0, 9999),
+        },
+    }
+
+    start = timer()
+    index = FilterIndex(df)
+    index.query(queries['defaults'])
+    index.query(queries['typical'])
+    print(f'rows: {rows}  index build: {timer() - start:.3f}s')
+
+    for name, predicates in queries.items():
+        scanned, expected = best(lambda: scan(df, predicates))
+        # Cold: every repeat starts without memoized masks.
+        indexed, mask = best(
+            lambda: index.query(predicates), setup=lambda: forget(index))
+        assert (mask == expected).all()
+        # Memo: the masks of each predicate are cached, the result is not.
+        memo, _ = best(lambda: index.query(predicates),
+                       setup=lambda: setattr(index, '_last', None))
+        print(f'{name:>9}: scan {scanned * 1e3:8.2f}ms  '
+              f'index {indexed * 1e3:8.2f}ms  '
+              f'speedup {scanned / indexed:6.1f}x  '
+              f'memo {memo * 1e3:8.2f}ms')
+
+    # Nudge the yaw upper bound down step by step, as in the Sidebar; each
+    # bound is new, so this times the refinement of the previous result.
+    predicates = dict(queries['typical'])
+    index.query(predicates)
+    scanned = indexed = 0
+    for upper in range(29, 0, -1):
+        predicates['pose.yaw'] = (-30, upper)
+        scanned += best(lambda: scan(df, predicates), 1)[0]
+        indexed += best(lambda: index.query(predicates), 1)[0]
+    print(f'{"nudging":>9}: scan {scanned * 1e3 / 29:8.2f}ms  '
+          f'index {indexed * 1e3 / 29:8.2f}ms  '
+          f'speedup {scanned / indexed:6.1f}x')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
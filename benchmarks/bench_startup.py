@@ -0,0 +1,99 @@
+# !/usr/bin/env python3
+
+"""Measure GUI startup against time budgets.
+
+Each run starts a fresh interpreter and times importing `datacanvas.app`,
+then, where a display is available, creating the window until it is
+mapped and until the widgets are built (`<<Ready>>`). It also reports the
+heavy modules imported before the window was mapped (without the
+background preloading of `main`, so all of them count). Exits with
+status 1 if a median is over budget or a heavy module was imported in
+time.
+
+Usage: python benchmarks/bench_startup.py [runs] [budget seconds]
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BUDGET = 0.25
+# Until the window is mapped, on top of the import.
+WINDOW = 0.5
+RUNS = 5
+HEAVY = ('numpy', 'pandas', 'matplotlib', 'PIL', 'seaborn')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CODE = f'''
+import json, sys, time
+start = time.perf_counter()
+import datacanvas.app
+times = {{'import_app': time.perf_counter() - start}}
+
+def heavy():
+    return [m for m in {HEAVY!r} if m in sys.modules]
+
+result = {{'heavy_modules': heavy()}}
+try:
+    window = datacanvas.app.DataCanvas()
+except Exception:
+    # No display.
+    window = None
+
+if window is not None:
+    def mapped(_):
+        if 'window_mapped' not in times:
+            times['window_mapped'] = time.perf_counter() - start
+            result['heavy_modules'] = heavy()
+
+    def ready(_):
+        times['window_ready'] = time.perf_counter() - start
+        window.after_idle(window.destroy)
+
+    window.bind('<Map>', mapped)
+    window.bind('<<Ready>>', ready)
+    window.mainloop()
+result['times'] = times
+print(json.dumps(result))
+'''
+
+
+def measure():
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    # The theme is sourced relative to the repository.
+    result = subprocess.run(
+        [sys.executable, '-c', CODE], cwd=ROOT, env=env, check=True,
+        capture_output=True, text=True)
+    return json.loads(result.stdout)
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else RUNS
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else BUDGET
+    budgets = {'import_app': budget, 'window_mapped': budget + WINDOW}
+    times, heavy = {}, set()
+    for _ in range(runs):
+        result = measure()
+        for name, seconds in result['times'].items():
+            times.setdefault(name, []).append(seconds)
+        heavy.update(result['heavy_modules'])
+
+    report = {
+        name: {'median': statistics.median(values), 'min': min(values),
+               'runs': len(values)}
+        for name, values in times.items()}
+    if 'window_mapped' not in report:
+        report['window'] = 'no display, window not measured'
+    report['budgets'] = budgets
+    report['heavy_modules'] = sorted(heavy)
+    print(json.dumps(report, indent=2))
+    over = [name for name, limit in budgets.items()
+            if name in times and statistics.median(times[name]) > limit]
+    if over or heavy:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
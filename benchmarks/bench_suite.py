@@ -0,0 +1,161 @@
+# !/usr/bin/env python3
+
+"""Headless timings of the main GUI operations on synthetic data.
+
+Generates a results file and images in a temporary folder, then times
+loading (parsing and cached), filtering, a free-form query, statistics,
+histograms, saving and the image decoding behind the Inspector. Prints
+the timings as JSON, or writes them to `--output`.
+
+Usage: python benchmarks/bench_suite.py [--images N] [--faces MIN MAX]
+           [--runs N] [--output FILE]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+from timeit import default_timer as timer
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from datacanvas.backend import Backend
+from datacanvas.imagecache import ImageCache, load_region
+from datacanvas.query import compile_query
+from datacanvas.stats import SummaryCache
+from datacanvas.synthetic import make_images, make_results
+
+# A typical Sidebar setting, and a slightly narrower one after it.
+FILTERS = [
+    {'quality': (40.0, 100.0), 'faces.age': (18.0, 60.0),
+     'faces.gender': {'Woman'}, 'pose.yaw': (-30.0, 30.0)},
+    {'quality': (45.0, 100.0), 'faces.age': (18.0, 60.0),
+     'faces.gender': {'Woman'}, 'pose.yaw': (-30.0, 30.0)},
+]
+# A free-form query, as typed into the Sidebar query box.
+EXPRESSION = ("abs(pose.yaw) < 20 and faces.dominant_emotion in "
+              "['happy', 'neutral'] and faces.iris_distance * 2 > 60")
+INSPECTOR = (495, 895)
+
+
+def measure(func, runs, setup=None):
+    """Wall times of `runs` calls of `func`, each after `setup`."""
+
+    times = []
+    for _ in range(runs):
+        if setup:
+            setup()
+        start = timer()
+        func()
+        times.append(timer() - start)
+    return {
+        'median': statistics.median(times),
+        'min': min(times),
+        'max': max(times),
+        'runs': runs,
+    }
+
+
+def run(images, faces, runs, folder):
+    path = os.path.join(folder, 'task.json')
+    files = make_results(
+        path, images, faces, folder=os.path.join(folder, 'img'))
+    make_images(files[:runs * 4])
+    results = {}
+
+    def load(cached):
+        def setup():
+            if not cached:
+                for name in os.listdir(f'{path}.cache'):
+                    os.remove(os.path.join(f'{path}.cache', name))
+            # Back to the unloaded state, so the file is read again.
+            backend.__init__()
+            backend.results = path
+
+        return setup
+
+    backend = Backend()
+    backend.results = path
+    backend.load_results()
+    results['load_results'] = measure(backend.load_results, runs, load(False))
+    results['load_results_cached'] = measure(
+        backend.load_results, runs, load(True))
+    rows = len(backend.base)
+
+    # The work of the Controller on the model, without Tk: `apply_filter`
+    # queries and shows the view (`_query` and `_show_filter`), the others
+    # are `get_stat` and `get_hist`.
+    stats = SummaryCache()
+    shown = {}
+
+    def apply_filter(predicates, expression=None):
+        backend.filter(predicates, expression)
+        shown['signature'] = backend.signature(predicates, expression)
+
+    def get_stat():
+        return stats.format(shown['signature'], backend.model)
+
+    def get_hist(attr):
+        return stats.plot(shown['signature'], backend.model, 'quality', attr)
+
+    def uncompiled():
+        compile_query.cache_clear()
+        backend._matched = None
+
+    results['apply_query'] = measure(
+        lambda: apply_filter(FILTERS[0], EXPRESSION), runs, uncompiled)
+    results['apply_filter'] = measure(
+        lambda: [apply_filter(predicates) for predicates in FILTERS], runs)
+    results['get_stat'] = measure(get_stat, runs, stats.clear)
+    results['get_stat_cached'] = measure(get_stat, runs)
+    results['get_hist'] = measure(
+        lambda: FigureCanvasAgg(get_hist('faces.dominant_emotion')).draw(),
+        runs, stats.clear)
+
+    out = os.path.join(folder, 'save')
+    os.makedirs(out, exist_ok=True)
+    results['save'] = measure(lambda: backend.save({}, out), runs)
+    results['save_compact'] = measure(
+        lambda: backend.save({}, out, compact=True), runs)
+
+    # Inspector: a first display, a display served from the cache, a zoom.
+    cache = ImageCache(INSPECTOR)
+    unseen = iter(files)
+    results['display_image'] = measure(lambda: cache.get(next(unseen)), runs)
+    results['display_image_cached'] = measure(
+        lambda: cache.get(files[0]), runs)
+    results['display_image_zoom'] = measure(
+        lambda: load_region(files[0], INSPECTOR), runs)
+
+    return {
+        'images': images,
+        'rows': rows,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--images', type=int, default=100_000)
+    parser.add_argument('--faces', type=int, nargs=2, default=(1, 3))
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        report = run(args.images, args.faces, args.runs, folder)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
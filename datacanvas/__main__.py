@@ -1,11 +1,16 @@
 # !/usr/bin/env python3
 
-from datacanvas import app
+import sys
 
 # Entry point for `python -m datacanvas`.
 
 if __name__ == '__main__':
-    """Package entry point for the GUI."""
+    """Package entry point, the GUI or the command line with arguments."""
 
-    app.main()
-    # app.DataCanvas().mainloop()
\ No newline at end of file
+    if len(sys.argv) > 1:
+        from datacanvas import cli
+        cli.main()
+    else:
+        from datacanvas import app
+        app.main()
+        # app.DataCanvas().mainloop()
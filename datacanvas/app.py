@@ -1,25 +1,29 @@
 # !/usr/bin/env python3
 
-"""General Tkinter GUI."""
+"""General Tkinter GUI.
 
-import json
+Only Tk and light modules are imported here. pandas, matplotlib and PIL
+are imported where they are first used, and in the background while the
+window comes up, see `main`. The window is shown with a loading note
+first; the model, widgets and controller are built once it is mapped,
+and `<<Ready>>` is generated when they are.
+"""
+
+import importlib
+import math
 import os
 import tkinter as tk
-from shutil import copy2 as cp
 # from platform import system
-from threading import Thread
+from queue import Empty, Queue
+from threading import Condition, Event, Thread
 from tkinter import filedialog as fd
 from tkinter import ttk
 from tkinter.messagebox import INFO, WARNING, askokcancel, showinfo
 
-import matplotlib.pyplot as plt
-import pandas as pd
-import seaborn as sns
-from matplotlib.backends.backend_tkagg import (FigureCanvasTkAgg,
-                                               NavigationToolbar2Tk)
-from PIL import Image, ImageOps, ImageTk
-
-# import datacanvas.utils as util
+from datacanvas import trace
+from datacanvas.export import MODES
+from datacanvas.jsonview import format_json
+from datacanvas.trace import traced
 
 WIDTH = 1280
 HEIGHT = 800
@@ -28,14 +32,35 @@ SHELL = 400
 PADDING = 5
 CANVAS = 500
 
-TYPE = ('.jpg', '.jpeg','.png')
+DEBOUNCE = 300
+POLL = 20
+
+# Imported in the background at startup, in order of first use.
+PRELOAD = (
+    'datacanvas.backend',
+    'datacanvas.stats',
+    'datacanvas.imagecache',
+    'datacanvas.thumbs',
+    'PIL.ImageTk',
+    'matplotlib.backends.backend_tkagg',
+)
 
 def main():
     """Entry point of the app."""
 
+    Thread(target=_preload, daemon=True).start()
     DataCanvas().mainloop()
 
 
+def _preload():
+    # An import started here is waited for, not repeated, by the UI thread.
+    for name in PRELOAD:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            return
+
+
 class DataCanvas(tk.Tk):
     """GUI window."""
 
@@ -67,10 +92,21 @@ class DataCanvas(tk.Tk):
         center_y = int(screen_height/2 - HEIGHT/2)
         self.geometry(f'{WIDTH}x{HEIGHT}+{center_x}+{center_y}')
 
-        # Create widget
-        self._setup_app()
+        # Show the window before building the widgets and their imports.
+        self.loading = ttk.Label(self, text='Loading...')
+        self.loading.pack(expand=True)
+        self.loading.bind('<Map>', self._mapped)
+
+    def _mapped(self, _):
+        self.loading.unbind('<Map>')
+        # Give the window a moment to be drawn.
+        self.after(POLL, self._setup_app)
 
     def _setup_app(self):
+        from datacanvas.backend import Backend
+
+        self.loading.destroy()
+
         # Setup Model
         self.model = Backend()
 
@@ -80,6 +116,7 @@ class DataCanvas(tk.Tk):
 
         # Setup Controller
         self.view.set_controller(Controller(self.model, self.view))
+        self.event_generate('<<Ready>>')
 
 
 class Page(ttk.Frame):
@@ -90,8 +127,8 @@ class Page(ttk.Frame):
         self.controller = None
         self.results = None
         self.modified = False
-        self.canvas_plot = tk.Canvas()
         self.default = "out/task.json"
+        self._pending = None
 
         self.parent.bind('<Key>', self._key_listener)
     
@@ -112,6 +149,8 @@ class Page(ttk.Frame):
         self.sidebar.pack(padx=PADDING, pady=PADDING, side='left', fill='y')
         self.plot_frame = Plot(self.label)
         self.plot_frame.pack(padx=PADDING, pady=PADDING, side='top')
+        self.plot_frame.canvas.bind(
+            '<<NotebookTabChanged>>', self._render_visible)
         self.plot_shell = Shell(self.overview)
         self.plot_shell.pack(side='left')
 
@@ -123,18 +162,44 @@ class Page(ttk.Frame):
         self.image_frame.pack(padx=PADDING, pady=PADDING, side='bottom')
         self.image_shell = Shell(self.inspector)
         self.image_shell.pack(side='left')
+
+        # Thumbnail grid tab
+        self.gallery = ttk.Frame(self.notebook)
+        self.grid_view = Grid(self.gallery, self)
+        self.grid_view.pack(padx=PADDING, pady=PADDING, fill='both', expand=True)
         
         self.notebook.add(self.overview, text="Overview")
         self.notebook.add(self.inspector, text="Inspector")
+        self.notebook.add(self.gallery, text="Grid")
     
     def get_results(self):
+        if self._pending:
+            self.after_cancel(self._pending)
+            self._pending = None
         self.results = self.sidebar.path.get()
+        self.controller.update()
+
+    def live_filter(self):
+        """Re-filter shortly after the last change of a Sidebar option."""
+
+        if self._pending:
+            self.after_cancel(self._pending)
+        self._pending = self.after(DEBOUNCE, self._live_filter)
+
+    def _live_filter(self):
+        self._pending = None
+        self.controller.apply_filter()
+
+    def show_results(self):
         self._update_content()
 
     def set_controller(self, Controller):
         self.controller = Controller
     
     def _key_listener(self, event):
+        # Typing in an entry is not a shortcut.
+        if isinstance(event.widget, ttk.Entry) and event.keysym != 'Return':
+            return
         if event.keysym == 'Return':
             self.get_results()
         if event.keysym == 't':
@@ -143,6 +208,8 @@ class Page(ttk.Frame):
             self.image_frame.remark_image()
         if event.keysym == 'a':
             self.image_frame.show_annotation()
+        if event.keysym == 'z':
+            self.image_frame.zoom_image()
         if event.keysym in ['Right', 'Down']:
             self.image_frame.display_image(1)
         if event.keysym in ['Left', 'Up']:
@@ -150,46 +217,46 @@ class Page(ttk.Frame):
     
     # Update model shown.
     def _update_content(self):
-        # Update data model
-        self.controller.update()
-
         # Update shell area
-        self.plot_shell.shell.delete('1.0', tk.END)
+        self.plot_shell.reset()
         self.plot_shell.insert("### Dataset Info ###")
         info = self.controller.get_info()
-        self.plot_shell.insert(json.dumps(info, indent=4))
+        self.plot_shell.insert_json(info)
         self.plot_shell.insert("### Filter Stat ###")
         stat = self.controller.get_stat()
         for item in stat:
             self.plot_shell.insert(item)
 
-        # Update plots area
-        plot_1 = self.controller.get_hist('faces.gender')
-        widget_1 = self.plot_frame.fig_1
-        self._render_plot(widget_1, plot_1)
-
-        plot_2 = self.controller.get_hist('faces.dominant_emotion')
-        widget_2 = self.plot_frame.fig_2
-        self._render_plot(widget_2, plot_2)
-
-        plot_3 = self.controller.get_hist('faces.dominant_race')
-        widget_3 = self.plot_frame.fig_3
-        self._render_plot(widget_3, plot_3)
+        # Update plots area, the hidden tabs render once selected.
+        self.plot_frame.state = (
+            self.controller.signature, self.controller.theme)
+        self._render_visible()
 
         # Update image inspector area
         self.image_frame.update_meta_list()
-
-    def _render_plot(self, widget, plot):
-        if self.canvas_plot:
-            for child in widget.winfo_children():
-                child.destroy()
-        self.canvas_plot = FigureCanvasTkAgg(plot, widget)
-        self.canvas_plot.draw()
-
-        toolbar = NavigationToolbar2Tk(self.canvas_plot, widget)
+        self.grid_view.update_files()
+
+    def _render_visible(self, *_):
+        tab = self.plot_frame.current()
+        attr = self.plot_frame.attrs.get(tab)
+        if attr and self.plot_frame.rendered.get(tab) != self.plot_frame.state:
+            self._render_plot(tab, attr)
+            self.plot_frame.rendered[tab] = self.plot_frame.state
+
+    @traced('render_plot')
+    def _render_plot(self, widget, attr):
+        from datacanvas.stats import restyle
+
+        # Update the bars of the tab's persistent figure, restyled from
+        # scratch only after a theme change.
+        figure, canvas, toolbar = self.plot_frame.figure(widget)
+        ax = figure.axes[0]
+        drawn = self.plot_frame.rendered.get(widget)
+        if drawn and drawn[1] != self.plot_frame.state[1]:
+            ax = restyle(figure)
+        self.controller.get_hist(attr, ax)
         toolbar.update()
-
-        self.canvas_plot.get_tk_widget().pack(expand=True)
+        canvas.draw_idle()
     
     def show_message(self, content):
         showinfo(
@@ -263,8 +330,19 @@ class Sidebar(ttk.Frame):
         self.parent = widget
 
         self.path = tk.StringVar(value='assets/out/test.json')
+        self.query = tk.StringVar(value='')
 
         self._setup_widgets()
+        self._setup_traces()
+
+    def _setup_traces(self):
+        # Every filter option re-filters live once editing pauses.
+        for name, var in vars(self).items():
+            if isinstance(var, tk.Variable) and name not in ('path', 'query'):
+                var.trace_add('write', self._changed)
+
+    def _changed(self, *_):
+        self.parent.live_filter()
 
     def _setup_widgets(self):
         self.io = ttk.LabelFrame(
@@ -281,6 +359,29 @@ class Sidebar(ttk.Frame):
             style='Accent.TButton',
             command=self._select_file
         ).pack(padx=PADDING, pady=PADDING)
+        # A folder loads all results files in it; a glob can be typed in.
+        ttk.Button(
+            self.io,
+            text='Open folder',
+            command=self._select_folder
+        ).pack(padx=PADDING, pady=PADDING)
+
+        # Applied on Return only, a half typed expression is not valid.
+        self.expr = ttk.LabelFrame(
+            self,
+            text='Query',
+        )
+        self.expr.pack(padx=PADDING, pady=PADDING, fill='x')
+        entry = ttk.Entry(self.expr,
+            textvariable=self.query
+            )
+        entry.pack(padx=PADDING, pady=PADDING, fill='x')
+        entry.bind('<Return>', self._apply_query)
+        ttk.Button(
+            self.expr,
+            text='Apply query',
+            command=self._apply_query
+        ).pack(padx=PADDING, pady=PADDING)
 
         self.menu = ttk.LabelFrame(
             self,
@@ -481,6 +582,12 @@ class Sidebar(ttk.Frame):
     
     def _get_results(self):
         self.parent.get_results()
+
+    def _apply_query(self, *_):
+        if self.parent.controller:
+            self.parent.controller.set_query(self.query.get())
+        # Keep Return from also reloading the results.
+        return 'break'
     
     def _select_file(self):
         filetypes = (
@@ -501,6 +608,19 @@ class Sidebar(ttk.Frame):
             )
             self.path.set(filepath)
 
+    def _select_folder(self):
+        folder = fd.askdirectory(
+            title='Open folder of JSON files',
+            initialdir='./',
+        )
+
+        if folder:
+            showinfo(
+                title='Selected',
+                message=f'Open {folder}'
+            )
+            self.path.set(folder)
+
 
 class Statusbar(ttk.Frame):
     def __init__(self, parent):
@@ -539,6 +659,20 @@ class Statusbar(ttk.Frame):
             text='Save',
             command=self._save
         ).pack(padx=PADDING, pady=PADDING, side='right')
+        self.mode = tk.StringVar(value='copy')
+        ttk.Combobox(
+            self,
+            textvariable=self.mode,
+            values=MODES + ('shards',),
+            state='readonly',
+            width=8
+        ).pack(padx=PADDING, pady=PADDING, side='right')
+        self.compact = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            self,
+            text='Compact',
+            variable=self.compact
+        ).pack(padx=PADDING, pady=PADDING, side='right')
         
         self.progress = ttk.Progressbar(
             self,
@@ -547,6 +681,61 @@ class Statusbar(ttk.Frame):
             length=SIDEBAR
         )
         self.busy = ttk.Label(self, text="Busy...")
+        self.cancel = ttk.Button(self, text='Cancel')
+        # Progress of loading results, apart from the task and job status.
+        self.reading = ttk.Label(self, text='')
+
+        self.tracing = tk.BooleanVar(value=trace.enabled())
+        ttk.Checkbutton(
+            self,
+            text='Trace',
+            variable=self.tracing,
+            command=self._toggle_trace
+        ).pack(padx=PADDING, pady=PADDING, side='left')
+        self.export = ttk.Button(
+            self,
+            text='Export Trace',
+            command=self._export_trace
+        )
+        self.timing = ttk.Label(self, text='')
+        self._toggle_trace()
+
+    def _toggle_trace(self):
+        trace.enable(self.tracing.get())
+        if self.tracing.get():
+            self.export.pack(padx=PADDING, pady=PADDING, side='left')
+            self.timing.pack(padx=PADDING, pady=PADDING, side='left')
+            self._show_timing()
+        else:
+            self.export.pack_forget()
+            self.timing.pack_forget()
+
+    def _show_timing(self):
+        # Last and rolling mean time of the span that finished last.
+        if not self.tracing.get():
+            return
+        name = trace.last()
+        if name:
+            timing = trace.summary()[name]
+            self.timing.config(
+                text=f"{name}: {timing['last']:.1f} ms "
+                     f"(mean {timing['mean']:.1f} ms of {timing['count']})")
+        self.after(POLL * 25, self._show_timing)
+
+    def _export_trace(self):
+        path = fd.asksaveasfilename(
+            title='Export trace',
+            initialfile='trace.json',
+            defaultextension='.json'
+        )
+        if path:
+            count = trace.export(path)
+            lines = [f'{count} spans saved to {path}']
+            for name, timing in sorted(trace.summary().items()):
+                lines.append(
+                    f"{name}: last {timing['last']:.1f} ms, "
+                    f"mean {timing['mean']:.1f} ms")
+            showinfo(title='Trace', message='\n'.join(lines))
     
     def _process(self, flag):
         if flag == 'start':
@@ -560,6 +749,42 @@ class Statusbar(ttk.Frame):
             self.progress.pack_forget()
             self.busy.pack_forget()
 
+    def show_progress(self, done, total):
+        if done < total:
+            self.reading.config(text=f'Loading... {100 * done // total}%')
+            self.reading.pack(padx=PADDING, pady=PADDING, side='left')
+        else:
+            self.reading.pack_forget()
+        self.update_idletasks()
+
+    def run_job(self, job, text, done):
+        """Start `job`, showing its progress until `done(job)` is called."""
+
+        self.progress.config(mode='determinate', value=0)
+        self.progress.pack(padx=PADDING, pady=PADDING, side='left')
+        self.busy.config(text=f'{text}...')
+        self.busy.pack(padx=PADDING, pady=PADDING, side='left')
+        self.cancel.config(command=job.cancel, state='normal')
+        self.cancel.pack(padx=PADDING, pady=PADDING, side='left')
+        job.start()
+        self._watch(job, text, done)
+
+    def _watch(self, job, text, done):
+        if job.is_alive():
+            if job.total:
+                self.progress.config(maximum=job.total, value=job.done)
+                self.busy.config(text=f'{text}... {job.done}/{job.total}')
+            if job.cancelled():
+                self.cancel.config(state='disabled')
+            self.after(POLL * 5, lambda: self._watch(job, text, done))
+            return
+        self.progress.config(mode='indeterminate')
+        self.progress.pack_forget()
+        self.busy.config(text='Busy...')
+        self.busy.pack_forget()
+        self.cancel.pack_forget()
+        done(job)
+
     def _clear_shell(self):
         self.parent.shell.clear()
     
@@ -572,7 +797,7 @@ class Statusbar(ttk.Frame):
     def start_task(self):
         self.flag = self.parent.controller.task.flag
         if self.flag:
-            task = AsyncProcess(self.flag)
+            task = AsyncProcess(self.flag, self.parent.default)
             task.start()
             self._process('start')
             self.monitor(task)
@@ -584,6 +809,15 @@ class Statusbar(ttk.Frame):
             self.after(5000, lambda: self.monitor(thread))
         else:
             self._process('end')
+            if thread.error:
+                showinfo(title='Error', message=thread.error)
+                return
+            if thread.result['errors']:
+                showinfo(
+                    title='Note',
+                    message=f"{len(thread.result['errors'])} images failed, "
+                            f"see metadata errors."
+                )
             answer = askokcancel(
                 title='Note',
                 message='Display new results?',
@@ -651,9 +885,40 @@ class Plot(ttk.Frame):
         self.fig_3.pack(side='left', fill='y')
         self.canvas.add(self.fig_3, text='Fig 3')
 
+        # Attribute plotted in each tab, and the state each was drawn for.
+        self.attrs = {
+            self.fig_1: 'faces.gender',
+            self.fig_2: 'faces.dominant_emotion',
+            self.fig_3: 'faces.dominant_race'
+        }
+        self.state = None
+        self.rendered = {}
+        self.figures = {}
+
+    def current(self):
+        return self.nametowidget(self.canvas.select())
+
+    def figure(self, tab):
+        """Figure, canvas and toolbar of a tab, created on first use."""
+
+        from matplotlib.backends.backend_tkagg import (FigureCanvasTkAgg,
+                                                       NavigationToolbar2Tk)
+        from matplotlib.figure import Figure
+
+        if tab not in self.figures:
+            figure = Figure()
+            figure.add_subplot()
+            canvas = FigureCanvasTkAgg(figure, tab)
+            toolbar = NavigationToolbar2Tk(canvas, tab)
+            canvas.get_tk_widget().pack(expand=True)
+            self.figures[tab] = (figure, canvas, toolbar)
+        return self.figures[tab]
+
 
 class Inspector(ttk.Frame):
     def __init__(self, parent, tab):
+        from datacanvas.imagecache import ImageCache
+
         super().__init__(parent)
         
         self.parent = tab
@@ -662,6 +927,10 @@ class Inspector(ttk.Frame):
         self.remark = tk.StringVar(value='Enter remark here')
         self.img_pointer = 0
         self.MAX_SIZE = (CANVAS - PADDING, CANVAS + SHELL - PADDING)
+        self.cache = ImageCache(self.MAX_SIZE)
+        self.zoom = False
+        self.centre = (0.5, 0.5)
+        self.size = None
 
         self._setup_widgets()
 
@@ -676,6 +945,7 @@ class Inspector(ttk.Frame):
         
         self.canvas = tk.Canvas(self, height=CANVAS, width=CANVAS+SHELL)
         self.canvas.pack(padx=PADDING, pady=PADDING)
+        self.canvas.bind('<Button-1>', self._zoom_at)
         
         ttk.Button(
             self.task,
@@ -688,6 +958,11 @@ class Inspector(ttk.Frame):
             command=lambda : self.display_image(1),
             text="Next"
             ).pack(padx=PADDING, pady=PADDING, side='left')
+        ttk.Button(
+            self.task,
+            command=self.zoom_image,
+            text="Zoom"
+            ).pack(padx=PADDING, pady=PADDING, side='left')
         ttk.Button(
             self.task,
             command=self.show_annotation,
@@ -707,37 +982,85 @@ class Inspector(ttk.Frame):
             textvariable=self.remark
             ).pack(padx=PADDING, pady=PADDING, side='left')
 
+    @traced('display_image')
     def display_image(self, offset=0):
+        from PIL import ImageTk
+
+        from datacanvas.imagecache import load_region
+
         try:
             self.img_pointer += offset
             if self.img_pointer < 0:
                 self.img_pointer = 0
             self.file = self.meta_list.iloc[self.img_pointer]['file']
-        except ValueError:
+        except (IndexError, ValueError):
             showinfo(
                 title='Note',
                 message='Out of Range.'
             )
             self.img_pointer -= offset
             return
-        self.img = Image.open(self.file)
+        if offset:
+            self.zoom = False
+        # Only a zoomed view needs the full resolution decode.
+        if self.zoom:
+            image, self.size = load_region(self.file, self.MAX_SIZE, self.centre)
+            zoom = "  |  Zoom: 1:1"
+        else:
+            image, self.size = self.cache.get(self.file)
+            zoom = ""
         self.annotation.config(
-            text = f"File: {self.file}  |  Resolution: {self.img.size}")
-        self.img = ImageTk.PhotoImage(ImageOps.pad(self.img, self.MAX_SIZE))
+            text = f"File: {self.file}  |  Resolution: {self.size}{zoom}")
+        self.img = ImageTk.PhotoImage(image)
         self.canvas.create_image(
             (CANVAS+SHELL)/2, CANVAS/2,
             image=self.img)
         self.display_meta(self.img_pointer)
+        self._prefetch()
+
+    def _prefetch(self):
+        from datacanvas.imagecache import PREFETCH
+
+        # Neighbours in browsing order, nearest first.
+        files = self.meta_list['file']
+        near = []
+        for step in range(1, PREFETCH + 1):
+            for pointer in (self.img_pointer + step, self.img_pointer - step):
+                if 0 <= pointer < len(files):
+                    near.append(files.iloc[pointer])
+        self.cache.prefetch(near)
     
+    def zoom_image(self):
+        self.zoom = not self.zoom
+        self.centre = (0.5, 0.5)
+        if self.meta_list is not None and self.meta_list.shape[0] > 0:
+            self.display_image()
+
+    def _zoom_at(self, event):
+        # Zoom in around the clicked point of the fitted image.
+        if self.zoom or not self.size:
+            return
+        width, height = self.size
+        scale = min(self.MAX_SIZE[0] / width, self.MAX_SIZE[1] / height)
+        left = (CANVAS + SHELL - width * scale) / 2
+        top = (CANVAS - height * scale) / 2
+        self.centre = (
+            min(max((event.x - left) / (width * scale), 0), 1),
+            min(max((event.y - top) / (height * scale), 0), 1))
+        self.zoom = True
+        self.display_image()
+
     def update_meta_list(self):
         self.meta_list = self.parent.controller.get_model()
         if self.meta_list.shape[0] > 0:
+            # A narrower filter may leave fewer images than the pointer.
+            self.img_pointer = min(self.img_pointer, len(self.meta_list) - 1)
             self.display_image()
 
     def display_meta(self, pointer):
-        self.parent.image_shell.shell.delete('1.0', tk.END)
-        meta = self.parent.controller.get_raw()[pointer]
-        self.parent.image_shell.insert(json.dumps(meta, indent=4))
+        self.parent.image_shell.reset()
+        meta = self.parent.controller.get_record(pointer)
+        self.parent.image_shell.insert_json(meta)
 
     def show_annotation(self):
         # TODO: Show detection annotation
@@ -755,6 +1078,153 @@ class Inspector(ttk.Frame):
             self.img_pointer, self.toggle)
 
 
+class Grid(ttk.Frame):
+    """Contact sheet of the filtered images.
+
+    Only the cells in view hold a `PhotoImage`; thumbnails come from the
+    `ThumbStore`, which makes missing ones for the visible cells and the
+    next screen on its worker pool. Nothing is requested, and the store
+    not polled, until the grid is shown.
+    """
+
+    def __init__(self, parent, tab):
+        from datacanvas.thumbs import ThumbStore
+
+        super().__init__(parent)
+
+        self.parent = tab
+        self.store = ThumbStore()
+        self.cell = self.store.size + 2*PADDING
+        self.columns = 1
+        self.files = []
+        self.rows = []
+        self.index = {}
+        self.thumbs = {}
+        self.cells = {}
+        self._polling = False
+
+        self._setup_widgets()
+
+    def _setup_widgets(self):
+        self.canvas = tk.Canvas(
+            self,
+            width=WIDTH - 4*PADDING,
+            height=CANVAS + SHELL//2
+        )
+        self.scroll = ttk.Scrollbar(
+            self,
+            orient='vertical',
+            command=self._yview
+        )
+        self.canvas.configure(yscrollcommand=self.scroll.set)
+        self.scroll.pack(side='right', fill='y')
+        self.canvas.pack(side='left', fill='both', expand=True)
+
+        self.canvas.bind('<Configure>', lambda _: self._layout())
+        self.canvas.bind('<Map>', lambda _: self._layout())
+        self.canvas.bind('<Button-1>', self._select)
+        self.canvas.bind('<MouseWheel>',
+            lambda event: self._yview('scroll', -event.delta//120, 'units'))
+        self.canvas.bind('<Button-4>',
+            lambda _: self._yview('scroll', -1, 'units'))
+        self.canvas.bind('<Button-5>',
+            lambda _: self._yview('scroll', 1, 'units'))
+
+    def update_files(self):
+        model = self.parent.controller.get_model()
+        first = ~model['file'].duplicated()
+        self.rows = first.to_numpy().nonzero()[0]
+        self.files = model['file'][first].tolist()
+        self.index = {file: i for i, file in enumerate(self.files)}
+        self.canvas.yview_moveto(0)
+        self._layout()
+
+    def _layout(self):
+        for i in list(self.cells):
+            self._drop(i)
+        self.columns = max(1, self.canvas.winfo_width() // self.cell)
+        height = math.ceil(len(self.files) / self.columns) * self.cell
+        self.canvas.configure(
+            scrollregion=(0, 0, self.columns*self.cell, height),
+            yscrollincrement=self.cell // 4)
+        self._draw()
+
+    def _yview(self, *args):
+        self.canvas.yview(*args)
+        self._draw()
+
+    def _draw(self):
+        if not self.canvas.winfo_viewable():
+            return
+        top = int(self.canvas.canvasy(0)) // self.cell
+        rows = self.canvas.winfo_height() // self.cell + 2
+        visible = range(
+            top*self.columns,
+            min(len(self.files), (top + rows)*self.columns))
+        for i in list(self.cells):
+            if i not in visible:
+                self._drop(i)
+        for i in visible:
+            if i not in self.cells:
+                self._show(i)
+
+        # Visible cells first, then one screen ahead.
+        ahead = range(
+            visible.stop,
+            min(len(self.files), visible.stop + rows*self.columns))
+        missing = [
+            self.files[i] for i in (*visible, *ahead)
+            if self.files[i] not in self.thumbs]
+        if missing:
+            self.store.request(missing)
+            if not self._polling:
+                self._polling = True
+                self._poll()
+
+    def _show(self, i):
+        from PIL import Image, ImageTk
+
+        x = i % self.columns * self.cell + self.cell // 2
+        y = i // self.columns * self.cell + self.cell // 2
+        half = self.store.size // 2
+        items = [self.canvas.create_rectangle(
+            x - half, y - half, x + half, y + half, outline='gray60')]
+        image = None
+        thumb = self.thumbs.get(self.files[i])
+        if thumb:
+            with Image.open(thumb) as file:
+                image = ImageTk.PhotoImage(file)
+            items.append(self.canvas.create_image(x, y, image=image))
+        self.cells[i] = (items, image)
+
+    def _drop(self, i):
+        items, _ = self.cells.pop(i)
+        self.canvas.delete(*items)
+
+    def _poll(self):
+        while not self.store.ready.empty():
+            path, thumb = self.store.ready.get()
+            # Unreadable images keep their placeholder.
+            self.thumbs[path] = thumb
+            i = self.index.get(path)
+            if thumb and i in self.cells:
+                self._drop(i)
+                self._show(i)
+        if self.store.busy:
+            self.after(POLL*5, self._poll)
+        else:
+            self._polling = False
+
+    def _select(self, event):
+        column = int(self.canvas.canvasx(event.x)) // self.cell
+        i = int(self.canvas.canvasy(event.y)) // self.cell * self.columns + column
+        if column < self.columns and i < len(self.files):
+            inspector = self.parent.image_frame
+            inspector.img_pointer = int(self.rows[i])
+            inspector.display_image()
+            self.parent.notebook.select(self.parent.inspector)
+
+
 class Shell(ttk.Frame):
     def __init__(self, parent):
         super().__init__(parent)
@@ -776,11 +1246,53 @@ class Shell(ttk.Frame):
         )
         self.label.pack(padx=PADDING, pady=PADDING, side='left')
         self.shell.pack(padx=PADDING, pady=PADDING)
+        self.shell.tag_configure('more', underline=True)
+        self._folds = 0
 
     def insert(self, output):
         self.shell.insert(tk.INSERT, f'{output}\n')
         self.shell.see("end")
 
+    def insert_json(self, value):
+        """Insert `value` as JSON, formatting large parts on click only."""
+
+        self._insert_pieces(tk.INSERT, format_json(value))
+        self.shell.see("end")
+
+    def reset(self):
+        """Remove all output, with the folds still holding values."""
+
+        self.shell.delete('1.0', tk.END)
+        for tag in self.shell.tag_names():
+            if tag.startswith('more') and tag != 'more':
+                self.shell.tag_delete(tag)
+
+    def _insert_pieces(self, index, pieces):
+        self.shell.mark_set('fold', index)
+        self.shell.mark_gravity('fold', tk.RIGHT)
+        text = []
+        for piece in pieces + [None]:
+            if isinstance(piece, str):
+                text.append(piece)
+                continue
+            if text:
+                self.shell.insert('fold', ''.join(text))
+                text = []
+            if piece is not None:
+                self._folds += 1
+                tag = f'more{self._folds}'
+                self.shell.insert('fold', piece.text, ('more', tag))
+                self.shell.tag_bind(
+                    tag, '<Button-1>',
+                    lambda _, tag=tag, piece=piece: self._expand(tag, piece))
+        self.shell.mark_unset('fold')
+
+    def _expand(self, tag, piece):
+        start, end = self.shell.tag_ranges(tag)[:2]
+        self.shell.delete(start, end)
+        self.shell.tag_delete(tag)
+        self._insert_pieces(start, piece.expand())
+
     def clear(self):
         answer = askokcancel(
             title='Confirmation',
@@ -788,7 +1300,7 @@ class Shell(ttk.Frame):
             icon=WARNING
         )
         if answer:
-            self.shell.delete('1.0', tk.END)
+            self.reset()
             showinfo(
                 title='Status',
                 message='CLI output all clear.'
@@ -797,6 +1309,8 @@ class Shell(ttk.Frame):
 
 class Task(tk.Toplevel):
     def __init__(self, parent, widget):
+        from datacanvas.worker import BATCH, WORKERS
+
         super().__init__(parent)
 
         self.parent = widget
@@ -809,9 +1323,10 @@ class Task(tk.Toplevel):
         # Calculates location of screen centre to put the gui window.
         screen_width = self.winfo_screenwidth()
         screen_height = self.winfo_screenheight()
+        height = CANVAS + SIDEBAR//2
         center_x = int(screen_width/2 - CANVAS/2)
-        center_y = int(screen_height/2 - CANVAS/2)
-        self.geometry(f'{SIDEBAR}x{CANVAS}+{center_x}+{center_y}')
+        center_y = int(screen_height/2 - height/2)
+        self.geometry(f'{SIDEBAR}x{height}+{center_x}+{center_y}')
 
         self.confidence = tk.DoubleVar(value=0.7)
         self.gender = tk.BooleanVar(value=True)
@@ -821,12 +1336,20 @@ class Task(tk.Toplevel):
         self.pose = tk.BooleanVar(value=True)
         self.quality = tk.BooleanVar(value=True)
 
+        self.analyzer = tk.StringVar(value='pixel')
+
+        self.workers = tk.IntVar(value=WORKERS)
+        self.batch = tk.IntVar(value=BATCH)
+        self.hash = tk.BooleanVar(value=False)
+
         self.folder = tk.StringVar(value="assets/data/")
 
         # Create widget
         self._setup_window()
 
     def _setup_window(self):
+        from datacanvas.worker import ANALYZERS
+
         self.io = ttk.LabelFrame(
             self,
             text='Image Folder',
@@ -903,6 +1426,42 @@ class Task(tk.Toplevel):
             variable=self.quality
         ).pack()
 
+        self.pool = ttk.Labelframe(
+            self,
+            text='Worker'
+        )
+        self.pool.pack(
+            padx=PADDING, pady=PADDING,
+            ipadx=PADDING, ipady=PADDING, fill='x')
+
+        ttk.Combobox(
+            self.pool,
+            values=list(ANALYZERS),
+            textvariable=self.analyzer
+        ).pack(padx=PADDING, pady=PADDING)
+        ttk.Label(self.pool, text='Processes / Batch Size:').pack()
+        self.options = ttk.Frame(self.pool)
+        self.options.pack()
+        ttk.Spinbox(
+            self.options,
+            from_=1,
+            to=256,
+            width=5,
+            textvariable=self.workers
+        ).pack(padx=PADDING, pady=PADDING, side='left')
+        ttk.Spinbox(
+            self.options,
+            from_=1,
+            to=4096,
+            width=5,
+            textvariable=self.batch
+        ).pack(padx=PADDING, pady=PADDING, side='left')
+        ttk.Checkbutton(
+            self.pool,
+            text='Verify Content Hash',
+            variable=self.hash
+        ).pack()
+
         ttk.Button(
             self,
             text='Run',
@@ -934,7 +1493,11 @@ class Task(tk.Toplevel):
             'ethnicity': self.ethnicity.get(),
             'emotion': self.emotion.get(),
             'pose': self.pose.get(),
-            'quality': self.quality.get()
+            'quality': self.quality.get(),
+            'analyzer': self.analyzer.get(),
+            'workers': self.workers.get(),
+            'batch': self.batch.get(),
+            'hash': self.hash.get()
         }
 
         answer = askokcancel(
@@ -948,92 +1511,102 @@ class Task(tk.Toplevel):
 
 
 class AsyncProcess(Thread):
-    def __init__(self, flag):
-        super().__init__()
+    def __init__(self, flag, out):
+        super().__init__(daemon=True)
         self.flag = flag
+        self.out = out
+        self.result = None
+        self.error = None
 
     def run(self) -> None:
-        # TODO: Link worker
-        showinfo(message=self.flag)
+        from datacanvas.worker import run_task
 
+        try:
+            self.result = run_task(self.flag, self.out)
+        except Exception as error:
+            self.error = error
 
-class Backend:
-    def __init__(self) -> None:
-        self._model = None
-        self._raw = None
-        self._info = None
-        self._files = None
-        self._results = None
-    
-    @property
-    def model(self) -> str:
-        return self._model
-    
-    @property
-    def raw(self) -> str:
-        return self._raw
-    
-    @property
-    def files(self) -> str:
-        return self._files
-    
-    @property
-    def results(self) -> str:
-        return self._results
-    
-    @property
-    def info(self) -> str:
-        return self._info
 
-    @files.setter
-    def files(self, path) -> None:
-        self._files = path
-    
-    @results.setter
-    def results(self, path) -> None:
-        self._results = path
-    
-    @model.setter
-    def model(self, model) -> None:
-        self._model = model
-
-    def load_results(self) -> None:
-        if os.path.exists(self._results):
-            with open(self._results) as f:
-                data = json.load(f)
-            self._model = pd.json_normalize(data["output"])
-            self._raw = data["output"]
-            self._info = data["metadata"]
-            self._files = data["metadata"]["files"]
-
-    def save(self, meta) -> None:
-        records = json.loads(self.model.to_json(orient="records"))
-        file = {
-            "metadata": meta,
-            "output": records
-        }
-        path = os.path.join(self.results, "output.json")
-        with open(path, "w") as f:
-            f.write(json.dumps(file, indent=4))
-        
-        answer = askokcancel(
-            title='New Dataset',
-            message='Create new dataset?',
-            icon=INFO
-        )
-        if answer:
-            dest = self.results
-            for image in self._raw:
-                source = image["file"]
-                cp(source, dest)
+class AsyncJob(Thread):
+    """Runs `func(*args, progress=..., cancelled=...)` in the background.
 
-        msg = f"Result saved at {self.results}"
+    The last progress report is kept in `done` and `total` for the UI to
+    poll; `cancel` makes `cancelled` return True.
+    """
 
-        return msg
+    def __init__(self, func, *args):
+        super().__init__(daemon=True)
+        self.func = func
+        self.args = args
+        self.done = 0
+        self.total = 0
+        self.result = None
+        self.error = None
+        self._cancel = Event()
+
+    def progress(self, done, total):
+        self.done, self.total = done, total
+
+    def cancel(self):
+        self._cancel.set()
+
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def run(self) -> None:
+        try:
+            self.result = self.func(
+                *self.args, progress=self.progress, cancelled=self.cancelled)
+        except Exception as error:
+            self.error = error
+
+
+class LiveQuery(Thread):
+    """Worker thread that only runs the newest submitted query.
+
+    `submit` replaces any query still waiting and makes the running one
+    stale; the running query is passed a `cancelled` callback to stop
+    early. Results are put on `results` as `(token, result, error)`.
+    """
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.token = 0
+        self.results = Queue()
+        self._job = None
+        self._wake = Condition()
+
+    def submit(self, func, *args):
+        with self._wake:
+            self.token += 1
+            self._job = (self.token, func, args)
+            self._wake.notify()
+        return self.token
+
+    def run(self) -> None:
+        while True:
+            with self._wake:
+                while self._job is None:
+                    self._wake.wait()
+                token, func, args = self._job
+                self._job = None
+
+            def cancelled():
+                return token != self.token
+
+            try:
+                result = func(*args, cancelled=cancelled)
+                error = None
+            except Exception as exception:
+                result, error = None, exception
+            if not cancelled():
+                self.results.put((token, result, error))
 
 
 class Controller:
     def __init__(self, model, view) -> None:
+        from datacanvas.stats import SummaryCache
+
         self.model = model
         self.view = view
         self.meta = None
@@ -1047,64 +1620,217 @@ class Controller:
         self.ethnicity = None
         self.age = None
         self.quality = None
+        self.iris_dist = None
         self.confidence = None
+        # Expression narrowing the Sidebar filter, see `datacanvas.query`.
+        self.expression = None
+        self.signature = None
+        self.theme = 'light'
+        self.stats = SummaryCache()
+
+        self.query = LiveQuery()
+        self.query.start()
+        self._shown = 0
+        self._polling = False
+
+    @staticmethod
+    def _checked(options):
+        return {value for value, var in options.items() if var.get()}
     
+    @traced('load')
     def load(self) -> None:
         try:
-            self.model.load_results()
+            self.model.load_results(self.view.status.show_progress)
         except Exception as error:
             self.view.show_message(error)
     
+    @traced('update')
     def update(self) -> None:
         self.model.results = self.view.results
         self.load()
 
         self.apply_filter()
-    
+
+    @traced('apply_filter')
     def apply_filter(self):
-        self.quality = self.view.sidebar.image_quality_var.get()
+        """Filter the model on the worker thread.
 
-        self.age = self.view.sidebar.age_var.get()
-        self.gender = [self.view.sidebar.gender_var.get()]
-        self.ethnicity = [self.view.sidebar.ethnicity_var.get()]
-        self.emotion = [self.view.sidebar.emotion_var.get()]
+        Only the result of the newest query is shown, older ones are
+        cancelled or dropped.
+        """
 
-        self.yaw = self.view.sidebar.pose_yaw.get()
-        self.pitch = self.view.sidebar.pose_pitch.get()
-        self.roll = self.view.sidebar.pose_roll.get()
+        if self.model.base is None:
+            return
+        try:
+            predicates = self.get_filter()
+        except tk.TclError:
+            # An entry is half typed, wait for the next change.
+            return
+        self.query.submit(self._query, predicates, self.expression)
+        # One poll chain at a time picks up the newest result.
+        if not self._polling:
+            self._polling = True
+            self._poll()
+
+    def set_query(self, text) -> None:
+        """Filter by the expression `text` as well, or no longer if empty.
+
+        The expression is run once first, so one naming an unknown column
+        or comparing mismatched types is reported here and the previous
+        expression kept, instead of failing every later filter.
+        """
+
+        from datacanvas.query import QueryError, compile_query
+
+        text = text.strip() or None
+        if text:
+            try:
+                if self.model.base is None:
+                    compile_query(text)
+                else:
+                    self.model.match(text)
+            except QueryError as error:
+                self.view.show_message(error)
+                return
+        self.expression = text
+        self.apply_filter()
 
-        df = self.model.model
-        self.model.model = df[
-            (df['quality'] < self.quality) &
-            (df['faces.age'] < self.age) &
-            (df['faces.gender'].isin(self.gender)) &
-            (df['faces.dominant_race'].isin(self.ethnicity)) &
-            (df['faces.dominant_emotion'].isin(self.emotion)) &
-            (df['pose.yaw'] < self.yaw) &
-            (df['pose.pitch'] < self.pitch) &
-            (df['pose.roll'] < self.roll)
-        ]
+    @traced('apply_filter.query')
+    def _query(self, predicates, expression, cancelled):
+        view = self.model.query(predicates, cancelled, expression)
+        if view is not None:
+            return predicates, expression, view
+
+    def _poll(self):
+        try:
+            while True:
+                token, view, error = self.query.results.get_nowait()
+                if token != self.query.token:
+                    continue
+                self._shown = token
+                if error:
+                    self.view.show_message(error)
+                else:
+                    self._show_filter(*view)
+        except Empty:
+            pass
+        if self._shown != self.query.token:
+            self.view.after(POLL, self._poll)
+        else:
+            self._polling = False
+
+    @traced('apply_filter.show')
+    def _show_filter(self, predicates, expression, view):
+        self.model.model = view
+        self.signature = self.model.signature(predicates, expression)
         self.meta = {
             'folder': self.model.files,
             'count': self.model.model.shape[0]
         }
-        
+
         self.view.modified = True
+        self.view.show_results()
+
+    def get_filter(self):
+        """Read the Sidebar options as `FilterIndex` predicates."""
+
+        from datacanvas.index import predicates
+
+        bar = self.view.sidebar
+
+        self.quality = (
+            bar.image_quality_lower.get(), bar.image_quality_upper.get())
+
+        self.age = (bar.age_lower.get(), bar.age_upper.get())
+        self.gender = self._checked({
+            'Man': bar.gender_male,
+            'Woman': bar.gender_female
+        })
+        self.ethnicity = self._checked({
+            'asian': bar.ethnicity_asian,
+            'indian': bar.ethnicity_indian,
+            'black': bar.ethnicity_african,
+            'white': bar.ethnicity_caucasian,
+            'middle eastern': bar.ethnicity_arabian,
+            'latino hispanic': bar.ethnicity_latino
+        })
+        self.emotion = self._checked({
+            'angry': bar.emotion_angry,
+            'disgust': bar.emotion_disgust,
+            'fear': bar.emotion_fear,
+            'happy': bar.emotion_happy,
+            'sad': bar.emotion_sad,
+            'surprise': bar.emotion_suprise,
+            'neutral': bar.emotion_neutral
+        })
+
+        self.yaw = (bar.pose_yaw_lower.get(), bar.pose_yaw_upper.get())
+        self.pitch = (bar.pose_pitch_lower.get(), bar.pose_pitch_upper.get())
+        self.roll = (bar.pose_roll_lower.get(), bar.pose_roll_upper.get())
+        self.iris_dist = (bar.iris_dist_lower.get(), bar.iris_dist_upper.get())
+
+        return predicates({
+            'quality': self.quality,
+            'age': self.age,
+            'gender': self.gender,
+            'ethnicity': self.ethnicity,
+            'emotion': self.emotion,
+            'yaw': self.yaw,
+            'pitch': self.pitch,
+            'roll': self.roll,
+            'iris': self.iris_dist
+        })
     
     def new_task(self):
         self.task = Task(self.view.parent, self)
     
     def save(self) -> None:
-        """Save results."""
-        path = self._select_folder()
-        if path:
-            self.model._results = path
-            try:               
-                msg = self.model.save(self.meta)
-                self.view.modified = False
-                self.view.show_message(msg)
-            except Exception as error:
-                self.view.show_message(error)
+        """Save results, and optionally their images, in the background."""
+        folder = self._select_folder()
+        if folder:
+            images = askokcancel(
+                title='New Dataset',
+                message='Create new dataset?',
+                icon=INFO
+            )
+            status = self.view.status
+            job = AsyncJob(
+                self._save, folder, images, status.mode.get(),
+                status.compact.get())
+            status.run_job(job, 'Saving', self._saved)
+
+    def _save(self, folder, images, mode, compact, progress, cancelled):
+        path = self.model.save(
+            self.meta, folder, compact, progress, cancelled)
+        report = None
+        if images and path:
+            if mode == 'shards':
+                report = self.model.export_shards(
+                    os.path.join(folder, 'shards'), self.meta,
+                    progress=progress, cancelled=cancelled)
+            else:
+                report = self.model.export_images(
+                    folder, mode, progress, cancelled)
+        return path, report
+
+    def _saved(self, job):
+        if job.error:
+            self.view.show_message(job.error)
+            return
+        path, report = job.result
+        if path is None:
+            self.view.show_message("Save cancelled.")
+            return
+        self.view.modified = False
+        msg = f"Result saved at {path}"
+        if report:
+            msg += (
+                f"\n{report['exported']} images exported, "
+                f"{report['skipped']} already there, "
+                f"{len(report['failed'])} failed")
+            if report['cancelled']:
+                msg += "\nExport cancelled."
+        self.view.show_message(msg)
 
     def get_files(self):
         return self.model.files
@@ -1115,8 +1841,8 @@ class Controller:
     def get_model(self):
         return self.model.model
     
-    def get_raw(self):
-        return self.model.raw
+    def get_record(self, pointer):
+        return self.model.record(pointer)
 
     def toggle_image(self, pointer, toggle):
         df = self.model.model
@@ -1133,30 +1859,18 @@ class Controller:
     def get_info(self):
         return self.model.info
     
+    @traced('get_stat')
     def get_stat(self):
-        try:
-            file = int(self.model.model["file"].count())
-            age = int(self.model.model["faces.age"].mean())
-            gender = self.model.model["faces.gender"].value_counts(normalize=True).to_string()
-            ethnicity = self.model.model["faces.dominant_race"].value_counts(normalize=True).to_string()
-            emotion = self.model.model["faces.dominant_emotion"].value_counts(normalize=True).to_string()
-            stat = [
-                f"> File count:\n{file}",
-                f"> Average age:\n{age}",
-                f"> Gender:\n{gender}",
-                f"> Ethnicity:\n{ethnicity}",
-                f"> Emotion:\n{emotion}"
-            ]
-        except:
-            file = int(self.model.model["file"].count())
-            stat = [f"> File count:\n{file}"]
-        return stat
+        return self.stats.format(self.signature, self.model.model)
 
     def change_theme(self, theme):
+        from matplotlib import style
+
+        self.theme = theme
         if theme == 'light':
-            plt.style.use("fivethirtyeight")
+            style.use("fivethirtyeight")
         if theme == 'dark':
-            plt.style.use("dark_background")
+            style.use("dark_background")
     
     def _select_folder(self):
         filepath = fd.askdirectory(
@@ -1167,21 +1881,8 @@ class Controller:
             return filepath
     
     # Plots for data model overview
-    # TODO: Build plots
-    def get_boxplot(self):
-        fig = plt.figure()
-        return fig
-    
-    def get_hist(self, attr):
-        fig, ax = plt.subplots()
-
-        data = self.get_model()
-
-        sns.histplot(
-            data,
-            x="quality",
-            hue=attr,
-            multiple="stack"
-        )
-
-        return fig
\ No newline at end of file
+    @traced('get_hist')
+    def get_hist(self, attr, ax=None):
+        # Kept per filter signature, so going back to a filter only draws.
+        return self.stats.plot(
+            self.signature, self.get_model(), 'quality', attr, ax)
\ No newline at end of file
@@ -0,0 +1,360 @@
+# !/usr/bin/env python3
+
+"""Data model behind the GUI and the command line.
+
+`Backend` loads one or more results files into a table (through the
+column cache), filters it with a `FilterIndex` and an optional expression
+(see `datacanvas.query`) and writes or exports the current view. It does
+not depend on Tk, so it can run on machines without a display.
+"""
+
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack
+
+import numpy as np
+import pandas as pd
+
+from datacanvas import cache
+from datacanvas.export import SHARD, export_images, export_shards
+from datacanvas.index import FilterIndex, signature
+from datacanvas.query import compile_query
+from datacanvas.trace import traced
+from datacanvas.utils import (OUTPUT, ROW, SOURCE, find_results,
+                              merge_metadata, new_hasher, read_columns,
+                              unflatten)
+from datacanvas.worker import WORKERS, write_results
+
+# Rows handled at a time when streaming records out of the table.
+ROWS = 10000
+
+
+def parse(path, progress=None):
+    """Parse a results file into `(frame, fields, offsets)` and cache it."""
+
+    hasher = new_hasher()
+    offsets = []
+    columns, fields = read_columns(path, progress, hasher, offsets)
+    # Convert column by column so the value lists can be freed early.
+    frame = pd.DataFrame(
+        {name: pd.Series(columns.pop(name)) for name in list(columns)})
+    # Position of each row in its file, kept through filtering.
+    frame[ROW] = np.arange(len(frame))
+    offsets = np.array(offsets, dtype=np.int64).reshape(-1, 2)
+    stored = cache.store(path, frame, fields, hasher.hexdigest(), offsets)
+    return frame, fields, offsets, stored
+
+
+def _parse(path):
+    """Parse a results file in a worker process.
+
+    The parent memory-maps the cache the worker wrote, so the table is
+    only sent back if the cache could not be written.
+    """
+
+    frame, fields, offsets, stored = parse(path)
+    return None if stored else (frame, fields, offsets)
+
+
+def load_tables(paths, progress=None, workers=WORKERS):
+    """`(frame, fields, offsets)` of each results file in `paths`.
+
+    Cached files are memory-mapped; the others are parsed on a process
+    pool, or in this process if there is only one or a single worker.
+    `progress` gets bytes read for a single file and files done for
+    several. If a file fails to parse, the files not started yet are
+    dropped and the error raised.
+    """
+
+    tables = [None] * len(paths)
+    todo = []
+    for i, path in enumerate(paths):
+        cached = cache.load(path)
+        if cached and cached[2] is not None:
+            tables[i] = cached
+        else:
+            todo.append(i)
+    if len(todo) == 1:
+        tables[todo[0]] = parse(paths[todo[0]], progress)[:3]
+    elif todo and workers < 2:
+        for done, i in enumerate(todo, 1):
+            tables[i] = parse(paths[i])[:3]
+            if progress:
+                progress(done, len(todo))
+    elif todo:
+        # Spawn so the pool never forks the Tk process.
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(min(workers, len(todo)), context) as pool:
+            futures = {pool.submit(_parse, paths[i]): i for i in todo}
+            try:
+                for done, future in enumerate(as_completed(futures), 1):
+                    i = futures[future]
+                    tables[i] = (future.result() or cache.load(paths[i])
+                                 or parse(paths[i])[:3])
+                    if progress:
+                        progress(done, len(todo))
+            except BaseException:
+                # Only wait for the files being parsed before raising.
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+    return tables
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def _changed(path, source):
+    try:
+        return cache.fingerprint(path) != source
+    except OSError:
+        return True
+
+
+class Backend:
+    def __init__(self) -> None:
+        # `_base` is the table as loaded and never modified, `_model` is the
+        # current (filtered) view of it.
+        self._base = None
+        self._model = None
+        self._index = None
+        # The last expression, the table and its row mask over it.
+        self._matched = None
+        # Per results file: path, fingerprint and record byte spans.
+        self._paths = None
+        self._source = None
+        self._offsets = None
+        self._info = None
+        self._files = None
+        self._results = None
+    
+    @property
+    def model(self) -> str:
+        return self._model
+
+    @property
+    def base(self) -> str:
+        return self._base
+
+    @property
+    def source(self) -> tuple:
+        """Path, size and mtime of each loaded results file."""
+
+        return tuple(tuple(source.values()) for source in self._source)
+
+    @property
+    def paths(self) -> list:
+        """The loaded results files, indexed by the `_source` column."""
+
+        return self._paths
+    
+    @property
+    def files(self) -> str:
+        return self._files
+    
+    @property
+    def results(self) -> str:
+        return self._results
+    
+    @property
+    def info(self) -> str:
+        return self._info
+
+    @files.setter
+    def files(self, path) -> None:
+        self._files = path
+    
+    @results.setter
+    def results(self, path) -> None:
+        self._results = path
+    
+    @model.setter
+    def model(self, model) -> None:
+        self._model = model
+
+    @traced('load_results')
+    def load_results(self, progress=None) -> None:
+        """Load the results unless they are already loaded unchanged.
+
+        `results` is a results file, a folder of them or a glob. Several
+        files are parsed in parallel and concatenated, with the file of
+        each row in the categorical `_source` column and their metadata
+        merged (see `merge_metadata`) under a `sources` list. Raises
+        FileNotFoundError if `results` names no file, keeping what is
+        loaded.
+        """
+
+        paths = find_results(self._results)
+        if not paths:
+            raise FileNotFoundError(f'No results files in {self._results}')
+        source = [cache.fingerprint(path) for path in paths]
+        if source == self._source:
+            return
+        tables = load_tables(paths, progress)
+        if len(tables) == 1:
+            self._base = tables[0][0]
+        else:
+            self._base = pd.concat(
+                [table[0] for table in tables], ignore_index=True)
+        lengths = [len(table[0]) for table in tables]
+        self._base[SOURCE] = pd.Categorical.from_codes(
+            np.repeat(np.arange(len(paths)), lengths), categories=paths)
+        self._offsets = [table[2] for table in tables]
+        self._model = self._base.copy(deep=False)
+        self._index = FilterIndex(self._base)
+        self._matched = None
+        self._paths = paths
+        self._source = source
+        if len(tables) == 1:
+            self._info = tables[0][1]["metadata"]
+        else:
+            self._info = merge_metadata(
+                [table[1]["metadata"] for table in tables])
+            self._info["sources"] = paths
+        self._files = self._info.get("files", [])
+
+    def select(self, mask) -> None:
+        """Set the current view to the rows of the base table in `mask`."""
+
+        self._model = self._base[mask]
+
+    def match(self, expression, base=None):
+        """Row mask of `base` (the base table) matching `expression`.
+
+        Raises `QueryError` for an invalid expression. The mask of the
+        last expression is kept with the table it was computed on, as it
+        usually stays while the Sidebar predicates change. Queries run
+        on another thread, so a mask computed on a table replaced in the
+        meantime is never used for the new one.
+        """
+
+        base = self._base if base is None else base
+        matched = self._matched
+        if (matched is None or matched[0] != expression
+                or matched[1] is not base):
+            mask = compile_query(expression)(base)
+            mask.flags.writeable = False
+            matched = self._matched = (expression, base, mask)
+        return matched[2]
+
+    @traced('query')
+    def query(self, predicates, cancelled=None, expression=None):
+        """Rows of the base table matching `predicates` and `expression`.
+
+        See `FilterIndex` and `datacanvas.query`. Returns None if
+        `cancelled` fired before the query finished.
+        """
+
+        base, index = self._base, self._index
+        mask = index.query(predicates, cancelled)
+        if mask is None:
+            return None
+        if expression:
+            mask = mask & self.match(expression, base)
+        return base[mask]
+
+    def signature(self, predicates, expression=None) -> tuple:
+        """Key of the view of a query, for `SummaryCache`.
+
+        It names the loaded files along with the query, so a reloaded or
+        replaced table never reuses the aggregates of the old one.
+        """
+
+        return self.source, signature(predicates), expression
+
+    def filter(self, predicates, expression=None) -> None:
+        """Set the current view to the rows matching the query, see `query`."""
+
+        self._model = self.query(predicates, expression=expression)
+
+    def records(self, frame=None):
+        """Full records of the rows of `frame` (the view by default).
+
+        Records are read from their results file by their byte span, with
+        the columns added to the view (e.g. `remark`) merged in. Rows of a
+        file that changed since it was loaded are rebuilt from the table.
+        """
+
+        frame = self._model if frame is None else frame
+        extra = frame.columns.difference(self._base.columns)
+        changed = [
+            _changed(path, source)
+            for path, source in zip(self._paths, self._source)]
+        with ExitStack() as stack:
+            files = {}
+            for start in range(0, len(frame), ROWS):
+                rows = frame.iloc[start:start + ROWS]
+                # Without columns `to_dict` would give no records at all.
+                added = (rows[extra].to_dict('records') if len(extra)
+                         else [{}] * len(rows))
+                sources = rows[SOURCE].cat.codes.to_numpy()
+                table = (rows.drop(columns=[ROW, SOURCE]).to_dict('records')
+                         if any(changed) else None)
+                for i, (row, source, fields) in enumerate(
+                        zip(rows[ROW].to_numpy(), sources, added)):
+                    if changed[source]:
+                        yield unflatten(table[i])
+                        continue
+                    if source not in files:
+                        files[source] = stack.enter_context(
+                            open(self._paths[source], 'rb'))
+                    f = files[source]
+                    begin, end = self._offsets[source][row]
+                    f.seek(begin)
+                    record = json.loads(f.read(end - begin))
+                    record.update(unflatten(fields))
+                    yield record
+
+    def record(self, index) -> dict:
+        """Full record of row `index` of the view, see `records`."""
+
+        return next(self.records(self._model.iloc[[index]]))
+
+    @traced('save')
+    def save(self, meta, folder, compact=False, progress=None,
+             cancelled=None) -> str:
+        """Stream the records of the view to `folder`/output.json.
+
+        Returns the path written, or None if `cancelled` fired first, in
+        which case an existing output.json is left as it was. The file is
+        not picked up when loading `folder` again, see `find_results`.
+        """
+
+        def counted(records):
+            for i, record in enumerate(records, 1):
+                if cancelled and cancelled():
+                    raise _Cancelled
+                yield record
+                if progress and (i % ROWS == 0 or i == total):
+                    progress(i, total)
+
+        total = len(self._model)
+        path = os.path.join(folder, OUTPUT)
+        try:
+            write_results(
+                path, meta, counted(self.records()), None if compact else 4)
+        except _Cancelled:
+            return None
+        return path
+
+    def export_images(self, folder, mode='copy', progress=None,
+                      cancelled=None) -> dict:
+        """Place the images of the view in `folder`, see `export_images`."""
+
+        paths = self._model["file"].dropna().unique().tolist()
+        # The analyzed folder keeps the layout stable across exports.
+        root = self._info.get("folder")
+        return export_images(
+            paths, folder, mode, progress=progress, cancelled=cancelled,
+            root=root if isinstance(root, str) else None)
+
+    def export_shards(self, folder, meta=None, shard=SHARD, progress=None,
+                      cancelled=None) -> dict:
+        """Pack the view into tar shards in `folder`, see `export_shards`."""
+
+        return export_shards(
+            self.records(), folder, meta, shard,
+            total=self._model["file"].nunique(), progress=progress,
+            cancelled=cancelled)
@@ -0,0 +1,157 @@
+# !/usr/bin/env python3
+
+"""Sidecar column cache for parsed results files.
+
+A results file `task.json` gets a `task.json.cache/` folder next to it
+holding one `.npy` file per numeric column (memory-mapped on load),
+factorized string columns and a JSON fallback for everything else, plus
+the byte span of every record in the source (`offsets.npy`). The
+manifest records the source fingerprint, so any change to the source
+invalidates the cache.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from datacanvas.utils import digest
+
+VERSION = 2
+OFFSETS = 'offsets.npy'
+MANIFEST = 'manifest.json'
+
+
+def cache_dir(path):
+    return f'{path}.cache'
+
+
+def fingerprint(path):
+    stat = os.stat(path)
+    return {
+        'path': os.path.abspath(path),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime_ns,
+    }
+
+
+def _manifest(folder):
+    try:
+        with open(os.path.join(folder, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(folder, manifest):
+    temp = os.path.join(folder, f'{MANIFEST}.tmp')
+    with open(temp, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(temp, os.path.join(folder, MANIFEST))
+
+
+def is_valid(path, manifest):
+    """Check a manifest against the current state of its source file."""
+
+    if manifest is None or manifest.get('version') != VERSION:
+        return False
+    source = manifest['source']
+    current = fingerprint(path)
+    if source['path'] != current['path'] or source['size'] != current['size']:
+        return False
+    if source['mtime'] == current['mtime']:
+        return True
+    # Touched but possibly unchanged, fall back to the content hash.
+    return manifest['digest'] == digest(path)
+
+
+def load(path):
+    """Return `(frame, fields, offsets)` from a valid cache, otherwise None.
+
+    `offsets` is None if the cache was stored without them.
+    """
+
+    folder = cache_dir(path)
+    manifest = _manifest(folder)
+    try:
+        if not is_valid(path, manifest):
+            return None
+        columns = {}
+        for column in manifest['columns']:
+            file = os.path.join(folder, column['file'])
+            if column['kind'] == 'array':
+                values = pd.Series(np.load(file, mmap_mode='r'), copy=False)
+            elif column['kind'] == 'factor':
+                lookup = np.array(column['categories'] + [None], dtype=object)
+                values = pd.Series(lookup[np.load(file)])
+                values = values.astype(column['dtype'])
+            else:
+                with open(file) as f:
+                    values = pd.Series(json.load(f), dtype=object)
+            columns[column['name']] = values
+        offsets = None
+        if manifest.get('offsets'):
+            offsets = np.load(
+                os.path.join(folder, manifest['offsets']), mmap_mode='r')
+    except (OSError, ValueError, KeyError):
+        return None
+
+    if manifest['source']['mtime'] != fingerprint(path)['mtime']:
+        manifest['source'] = fingerprint(path)
+        try:
+            _write_manifest(folder, manifest)
+        except OSError:
+            pass
+    return pd.DataFrame(columns, copy=False), manifest['fields'], offsets
+
+
+def store(path, frame, fields, source_digest, offsets=None):
+    """Write the cache for `path`, silently giving up if it is read-only.
+
+    Returns whether the cache was written.
+    """
+
+    folder = cache_dir(path)
+    try:
+        os.makedirs(folder, exist_ok=True)
+        old = os.path.join(folder, MANIFEST)
+        if os.path.exists(old):
+            os.remove(old)
+
+        columns = []
+        for i, name in enumerate(frame.columns):
+            series = frame[name]
+            column = {'name': name, 'dtype': str(series.dtype)}
+            if series.dtype.kind in 'biuf':
+                column.update(kind='array', file=f'{i}.npy')
+                np.save(os.path.join(folder, column['file']), series.to_numpy())
+            elif pd.api.types.is_string_dtype(series):
+                codes, categories = pd.factorize(series)
+                column.update(
+                    kind='factor', file=f'{i}.npy',
+                    categories=categories.tolist())
+                np.save(
+                    os.path.join(folder, column['file']),
+                    codes.astype(np.int32))
+            else:
+                column.update(kind='json', file=f'{i}.json')
+                with open(os.path.join(folder, column['file']), 'w') as f:
+                    json.dump(series.tolist(), f)
+            columns.append(column)
+        if offsets is not None:
+            np.save(
+                os.path.join(folder, OFFSETS),
+                np.asarray(offsets, dtype=np.int64).reshape(-1, 2))
+
+        _write_manifest(folder, {
+            'version': VERSION,
+            'source': fingerprint(path),
+            'digest': source_digest,
+            'fields': fields,
+            'columns': columns,
+            'offsets': OFFSETS if offsets is not None else None,
+        })
+    except (OSError, TypeError, ValueError):
+        return False
+    return True
@@ -0,0 +1,219 @@
+# !/usr/bin/env python3
+
+"""Command line interface for machines without a display.
+
+    python -m datacanvas analyze FOLDER [-o RESULTS]
+    python -m datacanvas load RESULTS
+    python -m datacanvas filter RESULTS [filters] [-o FOLDER]
+    python -m datacanvas stats RESULTS [filters] [--text]
+    python -m datacanvas export RESULTS FOLDER [filters] [--mode MODE]
+
+RESULTS is a results file, a folder of them or a quoted glob. Filters
+take the same options as the Sidebar, e.g. `--age 20 40 --gender Woman`,
+and `--query EXPR` narrows them by an expression (see `datacanvas.query`).
+Results are printed as JSON, progress goes to stderr.
+`--trace FILE` saves a Chrome trace of the run. Nothing here imports Tk.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from datacanvas import trace
+from datacanvas.backend import Backend
+from datacanvas.export import MODES, SHARD
+from datacanvas.index import CATEGORIES, RANGES, predicates
+from datacanvas.query import QueryError
+from datacanvas.stats import format_summary, summary
+from datacanvas.utils import find_results
+from datacanvas.worker import ANALYZERS, BATCH, OPTIONS, WORKERS, run_task
+
+DEFAULT = 'out/task.json'
+
+
+def progress(text):
+    """Progress callback printing to a terminal on stderr, else None."""
+
+    if not sys.stderr.isatty():
+        return None
+
+    def show(done, total):
+        end = '\n' if done >= total else ''
+        print(f'\r{text}... {done}/{total}', end=end, file=sys.stderr)
+    return show
+
+
+def positive(text):
+    """Argument type of a count, which must be at least 1."""
+
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid int value: {text!r}')
+    if value < 1:
+        raise argparse.ArgumentTypeError(f'must be at least 1: {value}')
+    return value
+
+
+def output(result):
+    print(json.dumps(result, indent=2, default=str))
+
+
+def load(args, filtered=True):
+    """Backend with the results of `args`, filtered by its options."""
+
+    if not find_results(args.results):
+        sys.exit(f'datacanvas: no results files in {args.results}')
+    backend = Backend()
+    backend.results = args.results
+    backend.load_results(progress('Loading'))
+    if filtered:
+        try:
+            backend.filter(predicates(vars(args)), args.query)
+        except QueryError as error:
+            sys.exit(f'datacanvas: {error}')
+    return backend
+
+
+def _load(args):
+    backend = load(args, filtered=False)
+    output({
+        'results': args.results,
+        'rows': len(backend.base),
+        'files': int(backend.base['file'].nunique()),
+        'columns': [str(name) for name in backend.base.columns],
+    })
+
+
+def _filter(args):
+    backend = load(args)
+    result = {
+        'rows': len(backend.model),
+        'files': int(backend.model['file'].nunique()),
+    }
+    if args.output:
+        result['output'] = backend.save(
+            backend.info, args.output, args.compact, progress('Saving'))
+    output(result)
+
+
+def _stats(args):
+    stat = summary(load(args).model)
+    if args.text:
+        print('\n'.join(format_summary(stat)))
+    else:
+        output(stat)
+
+
+def _export(args):
+    backend = load(args)
+    os.makedirs(args.folder, exist_ok=True)
+    backend.save(backend.info, args.folder, args.compact, progress('Saving'))
+    if args.mode == 'shards':
+        report = backend.export_shards(
+            args.folder, backend.info, args.shard, progress('Exporting'))
+    else:
+        report = backend.export_images(
+            args.folder, args.mode, progress('Exporting'))
+    output(report)
+
+
+def _analyze(args):
+    flag = {
+        'folder': args.folder,
+        'confidence': args.confidence,
+        'analyzer': args.analyzer,
+        'workers': args.workers,
+        'batch': args.batch,
+        'hash': args.hash,
+        'pose': 'pose' not in args.skip,
+        'quality': 'quality' not in args.skip,
+    }
+    flag.update({option: option not in args.skip for option in OPTIONS})
+    metadata = run_task(flag, args.output, progress('Analyzing'))
+    output({
+        'output': args.output,
+        'files': len(metadata['files']),
+        'errors': metadata['errors'],
+    })
+
+
+def parser():
+    filters = argparse.ArgumentParser(add_help=False)
+    group = filters.add_argument_group('filters')
+    for name in RANGES:
+        group.add_argument(
+            f'--{name}', nargs=2, type=float, metavar=('LOWER', 'UPPER'))
+    for name in CATEGORIES:
+        group.add_argument(f'--{name}', nargs='+', metavar='VALUE')
+    group.add_argument('--query', metavar='EXPR',
+                       help="expression over any column, e.g. "
+                            "\"abs(pose.yaw) < 15 and quality > 50\"")
+
+    main = argparse.ArgumentParser(
+        prog='datacanvas',
+        description='Filter, summarize and export DataCanvas results. '
+                    'Run without arguments to start the GUI.')
+    main.add_argument('--trace', metavar='FILE',
+                      help='save a Chrome trace of the run to FILE')
+    commands = main.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser(
+        'analyze', help='analyze an image folder into a results file')
+    command.add_argument('folder')
+    command.add_argument('-o', '--output', default=DEFAULT)
+    command.add_argument('--analyzer', default='pixel',
+                         help=f"one of {', '.join(ANALYZERS)} or module:Class")
+    command.add_argument('--workers', type=positive, default=WORKERS)
+    command.add_argument('--batch', type=positive, default=BATCH)
+    command.add_argument('--confidence', type=float, default=0.7)
+    command.add_argument('--hash', action='store_true',
+                         help='recognize touched but unchanged images by hash')
+    command.add_argument('--skip', nargs='+', default=[],
+                         choices=list(OPTIONS) + ['pose', 'quality'],
+                         help='attributes to leave out')
+    command.set_defaults(func=_analyze)
+
+    command = commands.add_parser(
+        'load', help='parse a results file into its cache and describe it')
+    command.add_argument('results')
+    command.set_defaults(func=_load)
+
+    command = commands.add_parser(
+        'filter', parents=[filters], help='count or save matching rows')
+    command.add_argument('results')
+    command.add_argument('-o', '--output', help='folder for output.json')
+    command.add_argument('--compact', action='store_true')
+    command.set_defaults(func=_filter)
+
+    command = commands.add_parser(
+        'stats', parents=[filters], help='summary statistics of matching rows')
+    command.add_argument('results')
+    command.add_argument('--text', action='store_true',
+                         help='print as in the GUI instead of JSON')
+    command.set_defaults(func=_stats)
+
+    command = commands.add_parser(
+        'export', parents=[filters],
+        help='save matching rows with their images or as tar shards')
+    command.add_argument('results')
+    command.add_argument('folder')
+    command.add_argument('--mode', choices=MODES + ('shards',), default='copy')
+    command.add_argument('--shard', type=positive, default=SHARD,
+                         help='samples per shard')
+    command.add_argument('--compact', action='store_true')
+    command.set_defaults(func=_export)
+    return main
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    if args.trace:
+        trace.enable()
+    try:
+        with trace.span(args.command):
+            args.func(args)
+    finally:
+        if args.trace:
+            trace.export(args.trace)
@@ -0,0 +1,285 @@
+# !/usr/bin/env python3
+
+"""Export of the images of a filtered dataset.
+
+Images are placed on a thread pool, as copies, hard links or reflinks
+(copy-on-write clones, where the file system supports them). Either link
+mode falls back to a copy when linking is not possible. Each image keeps
+its path below a root folder (by default the common folder of all
+images), so images of the same name in different folders do not
+collide. Images already exported with the same size and mtime are
+skipped, so an interrupted export can simply be run again.
+
+`export_shards` instead packs the samples into tar shards of a fixed
+number of samples, for training pipelines that stream them in order.
+"""
+
+import io
+import json
+import os
+import shutil
+import tarfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MODES = ('copy', 'hardlink', 'reflink')
+WORKERS = 8
+SHARD = 1000
+INDEX = 'index.json'
+# ioctl request cloning a whole file on Linux (btrfs, xfs, ...).
+FICLONE = 0x40049409
+
+
+def _copy(source, dest):
+    temp = f'{dest}.tmp'
+    shutil.copy2(source, temp)
+    os.replace(temp, dest)
+
+
+def _reflink(source, dest):
+    temp = f'{dest}.tmp'
+    with open(source, 'rb') as src, open(temp, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    shutil.copystat(source, temp)
+    os.replace(temp, dest)
+
+
+def _same(source, dest):
+    try:
+        dest = os.stat(dest)
+    except OSError:
+        return False
+    # Copies keep the mtime and links share it.
+    source = os.stat(source)
+    return (dest.st_size, dest.st_mtime_ns) == (
+        source.st_size, source.st_mtime_ns)
+
+
+def place(source, dest, mode='copy'):
+    """Put `source` at `dest`; returns False if it was already there."""
+
+    if _same(source, dest):
+        return False
+    os.makedirs(os.path.dirname(dest) or '.', exist_ok=True)
+    try:
+        if mode == 'hardlink':
+            if os.path.exists(dest):
+                os.remove(dest)
+            os.link(source, dest)
+            return True
+        if mode == 'reflink' and fcntl is not None:
+            _reflink(source, dest)
+            return True
+    except OSError:
+        # Other file system, or no support for the link type.
+        pass
+    _copy(source, dest)
+    return True
+
+
+def _below(path, root):
+    try:
+        return os.path.commonpath([path, root]) == root
+    except ValueError:
+        # On different drives.
+        return False
+
+
+def destinations(paths, folder, root=None):
+    """Collision-free destination of each image in `folder`.
+
+    Images below `root` (by default the common folder of all images) keep
+    their path below it, any others their whole path.
+    """
+
+    paths = [os.path.abspath(path) for path in paths]
+    if root is None and paths:
+        try:
+            root = os.path.commonpath(
+                [os.path.dirname(path) for path in paths])
+        except ValueError:
+            pass
+    root = root and os.path.abspath(root)
+    return [
+        os.path.join(folder, os.path.relpath(path, root)
+                     if root and _below(path, root)
+                     else os.path.splitdrive(path)[1].lstrip(os.sep))
+        for path in paths]
+
+
+def export_images(paths, folder, mode='copy', workers=WORKERS,
+                  progress=None, cancelled=None, root=None):
+    """Place the images of `paths` in `folder`, see `place`.
+
+    Images keep their path below `root`, see `destinations`.
+
+    Returns a report with the number of images `exported` and `skipped`,
+    the `failed` ones with their error, and whether it was `cancelled`.
+    """
+
+    if mode not in MODES:
+        raise ValueError(f'Unknown export mode {mode!r}, use one of {MODES}')
+    os.makedirs(folder, exist_ok=True)
+    paths = list(dict.fromkeys(paths))
+    report = {'exported': 0, 'skipped': 0, 'failed': {}, 'cancelled': False}
+    done = 0
+
+    def collect(futures):
+        nonlocal done
+        for future in futures:
+            path = pending.pop(future)
+            try:
+                report['exported' if future.result() else 'skipped'] += 1
+            except OSError as error:
+                report['failed'][path] = str(error)
+            done += 1
+        if progress:
+            progress(done, len(paths))
+
+    pending = {}
+    with ThreadPoolExecutor(workers) as pool:
+        for path, dest in zip(paths, destinations(paths, folder, root)):
+            if cancelled and cancelled():
+                report['cancelled'] = True
+                break
+            pending[pool.submit(place, path, dest, mode)] = path
+            # Keep a bounded number of images in flight.
+            if len(pending) >= workers * 4:
+                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+        collect(wait(pending).done)
+    return report
+
+
+def samples(records):
+    """Group consecutive records of the same file as `(file, records)`.
+
+    Results files keep the faces of an image together, so grouping
+    consecutive records gives one sample per image without holding more
+    than one sample in memory.
+    """
+
+    file, group = None, []
+    for record in records:
+        if group and record.get('file') != file:
+            yield file, group
+            group = []
+        file = record.get('file')
+        group.append(record)
+    if group:
+        yield file, group
+
+
+def _add(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    tar.addfile(info, io.BytesIO(data))
+
+
+def write_shard(path, first, batch):
+    """Write samples numbered from `first` to the tar file at `path`.
+
+    Each sample is stored as `<key><ext>` with the image bytes and
+    `<key>.json`, `key` being the zero-padded sample number. The JSON
+    holds the file and, for every other field of its records (`faces`,
+    `pose`, ...), the list of the values of each face. Returns the shard
+    entry of the index, with the images that could not be read under
+    `failed`.
+    """
+
+    count, failed = 0, {}
+    temp = f'{path}.tmp'
+    with tarfile.open(temp, 'w') as tar:
+        for number, (file, records) in enumerate(batch, first):
+            try:
+                with open(file, 'rb') as f:
+                    image = f.read()
+            except (OSError, TypeError) as error:
+                failed[file] = str(error)
+                continue
+            key = f'{number:09d}'
+            ext = os.path.splitext(file)[1].lower() or '.bin'
+            _add(tar, f'{key}{ext}', image)
+            fields = dict.fromkeys(
+                field for record in records for field in record
+                if field != 'file')
+            sample = {'file': file}
+            for field in fields:
+                sample[field] = [record.get(field) for record in records]
+            _add(tar, f'{key}.json', json.dumps(sample).encode())
+            count += 1
+    os.replace(temp, path)
+    return {
+        'name': os.path.basename(path),
+        'first': first,
+        'samples': count,
+        'bytes': os.path.getsize(path),
+        'failed': failed,
+    }
+
+
+def export_shards(records, folder, metadata=None, shard=SHARD,
+                  workers=WORKERS, total=None, progress=None, cancelled=None):
+    """Pack the samples of `records` into tar shards in `folder`.
+
+    Shards are written in parallel as `shard-<n>.tar` with `shard`
+    samples each, and listed in order in `index.json` together with
+    `metadata`. `total` is the number of samples expected, for progress
+    only. Returns a report like `export_images`.
+
+    A cancelled export still lists the shards it wrote, which hold the
+    first samples in order, with `complete` false in the index.
+    """
+
+    os.makedirs(folder, exist_ok=True)
+    report = {'exported': 0, 'skipped': 0, 'failed': {}, 'cancelled': False}
+    shards, pending = [], {}
+    done = 0
+
+    def collect(futures):
+        nonlocal done
+        for future in futures:
+            pending.pop(future)
+            entry = future.result()
+            shards.append(entry)
+            report['exported'] += entry['samples']
+            report['failed'].update(entry.pop('failed'))
+            done += entry['samples']
+        if progress:
+            progress(done, max(done, total or 0))
+
+    def submit(batch, first):
+        path = os.path.join(folder, f'shard-{first // shard:06d}.tar')
+        pending[pool.submit(write_shard, path, first, batch)] = path
+
+    with ThreadPoolExecutor(workers) as pool:
+        batch, first = [], 0
+        for number, sample in enumerate(samples(records)):
+            if cancelled and cancelled():
+                report['cancelled'] = True
+                break
+            batch.append(sample)
+            if len(batch) == shard:
+                submit(batch, first)
+                batch, first = [], number + 1
+                if len(pending) >= workers * 2:
+                    collect(wait(pending, return_when=FIRST_COMPLETED).done)
+        else:
+            if batch:
+                submit(batch, first)
+        collect(wait(pending).done)
+
+    shards.sort(key=lambda entry: entry['first'])
+    temp = os.path.join(folder, f'{INDEX}.tmp')
+    with open(temp, 'w') as f:
+        json.dump({
+            'metadata': metadata,
+            'samples': report['exported'],
+            'complete': not report['cancelled'],
+            'shards': shards,
+        }, f)
+    os.replace(temp, os.path.join(folder, INDEX))
+    return report
@@ -0,0 +1,125 @@
+# !/usr/bin/env python3
+
+"""Decoded image cache for the Inspector.
+
+Keeps images padded to the display size in an LRU bounded by a memory
+budget, and decodes the neighbours of the current image on a small
+thread pool so stepping through the filtered list is served from memory.
+
+JPEGs much larger than the display are decoded at reduced resolution
+(1/2 to 1/8 scale in the decoder); only `load_region`, used for zooming,
+decodes at full resolution.
+"""
+
+import math
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from PIL import Image, ImageOps
+
+from datacanvas.trace import traced
+
+BUDGET = 128 << 20
+PREFETCH = 3
+WORKERS = 2
+
+
+@traced('decode')
+def load_display(path, size):
+    """Decode `path` padded to `size`; returns `(image, original size)`."""
+
+    with Image.open(path) as image:
+        original = image.size
+        # Let the JPEG decoder scale down to no less than the padded size.
+        scale = min(size[0] / original[0], size[1] / original[1])
+        if scale < 1:
+            image.draft(image.mode, (
+                math.ceil(original[0] * scale),
+                math.ceil(original[1] * scale)))
+        return ImageOps.pad(image, size), original
+
+
+@traced('decode.region')
+def load_region(path, size, centre=(0.5, 0.5)):
+    """Full resolution crop of `size` around `centre` (relative position).
+
+    Returns `(image, original size)` like `load_display`.
+    """
+
+    with Image.open(path) as image:
+        width, height = image.size
+        left = round(centre[0] * width - size[0] / 2)
+        top = round(centre[1] * height - size[1] / 2)
+        left = max(0, min(left, width - size[0]))
+        top = max(0, min(top, height - size[1]))
+        region = image.crop((left, top, left + size[0], top + size[1]))
+        return ImageOps.pad(region, size), (width, height)
+
+
+class ImageCache:
+    def __init__(self, size, budget=BUDGET, workers=WORKERS):
+        self.size = size
+        self.budget = budget
+        self._images = OrderedDict()
+        self._used = 0
+        self._pending = {}
+        self._lock = Lock()
+        self._pool = ThreadPoolExecutor(workers)
+
+    @staticmethod
+    def _cost(image):
+        return image.width * image.height * len(image.getbands())
+
+    def _store(self, path, entry):
+        with self._lock:
+            self._pending.pop(path, None)
+            if path in self._images:
+                return
+            self._images[path] = entry
+            self._used += self._cost(entry[0])
+            while self._used > self.budget and len(self._images) > 1:
+                _, (image, _) = self._images.popitem(last=False)
+                self._used -= self._cost(image)
+
+    def _load(self, path):
+        try:
+            entry = load_display(path, self.size)
+        except Exception:
+            with self._lock:
+                self._pending.pop(path, None)
+            raise
+        self._store(path, entry)
+        return entry
+
+    def get(self, path):
+        """`(padded image, original size)` of `path`, decoding on a miss."""
+
+        with self._lock:
+            if path in self._images:
+                self._images.move_to_end(path)
+                return self._images[path]
+            future = self._pending.get(path)
+        if future is not None:
+            try:
+                return future.result()
+            except Exception:
+                pass
+        return self._load(path)
+
+    def prefetch(self, paths):
+        """Decode `paths` in the background, dropping stale requests."""
+
+        wanted = set(paths)
+        with self._lock:
+            for path, future in list(self._pending.items()):
+                if path not in wanted and future.cancel():
+                    del self._pending[path]
+            for path in paths:
+                if path not in self._images and path not in self._pending:
+                    self._pending[path] = self._pool.submit(self._load, path)
+
+    def clear(self):
+        with self._lock:
+            self._images.clear()
+            self._used = 0
@@ -0,0 +1,270 @@
+# !/usr/bin/env python3
+
+"""Indexed filter engine over the results table.
+
+Predicates are given as `{column: (lower, upper)}` for inclusive numeric
+ranges and `{column: {values}}` for categorical sets. Numeric columns get
+a sorted index, categorical columns a bitmap per value, both built once
+on first use. A query resolves each predicate to a row bitmap from its
+index and intersects them, instead of scanning every row per predicate.
+
+Missing values follow one rule in both indexes: a predicate that
+excludes no known value of its column (a range spanning all values, a
+set holding all of them) is no constraint and keeps every row, missing
+ones included; a predicate that excludes any value also excludes the
+missing values. Predicates on columns absent from the table are ignored.
+
+Bitmaps are cached per predicate value, and the last result is kept:
+when a single predicate changes only the changed one is looked up, and
+when it narrows (a tighter range, a subset of values) it is evaluated on
+the rows of the last result only. Returned masks are read-only.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+CACHE = 64
+
+# Filter options of the Sidebar and the command line, by the column each
+# one limits to a range or to a set of values.
+RANGES = {
+    'quality': 'quality',
+    'age': 'faces.age',
+    'yaw': 'pose.yaw',
+    'pitch': 'pose.pitch',
+    'roll': 'pose.roll',
+    'iris': 'faces.iris_distance',
+}
+CATEGORIES = {
+    'gender': 'faces.gender',
+    'ethnicity': 'faces.dominant_race',
+    'emotion': 'faces.dominant_emotion',
+}
+
+
+def _key(predicate):
+    if isinstance(predicate, tuple):
+        return tuple(sorted(predicate))
+    return frozenset(predicate)
+
+
+def signature(predicates):
+    """Hashable, order independent key of a set of predicates."""
+
+    return tuple(sorted(
+        (column, _key(predicate)) for column, predicate in predicates.items()))
+
+
+def predicates(options):
+    """Predicates of the filter `options` by name, leaving out None ones.
+
+    See `RANGES` and `CATEGORIES` for the names.
+    """
+
+    result = {}
+    for name, column in RANGES.items():
+        if options.get(name) is not None:
+            result[column] = tuple(options[name])
+    for name, column in CATEGORIES.items():
+        if options.get(name) is not None:
+            result[column] = set(options[name])
+    return result
+
+
+def _narrows(old, new):
+    if type(old) is not type(new):
+        return False
+    if isinstance(new, tuple):
+        return old[0] <= new[0] and new[1] <= old[1]
+    return new <= old
+
+
+class RangeIndex:
+    """Row order of a numeric column sorted by value, missing values last."""
+
+    def __init__(self, series):
+        self.raw = pd.to_numeric(series, errors='coerce').to_numpy(float)
+        self.order = np.argsort(self.raw, kind='stable')
+        self.values = self.raw[self.order]
+        self.size = len(self.raw)
+        self.valid = self.size - int(np.isnan(self.raw).sum())
+
+    def _bounds(self, lower, upper):
+        valid = self.values[:self.valid]
+        start = int(np.searchsorted(valid, lower, 'left'))
+        stop = int(np.searchsorted(valid, upper, 'right'))
+        return start, stop
+
+    def lookup(self, lower, upper):
+        """Bitmap of rows with `lower <= value <= upper`, None if all."""
+
+        start, stop = self._bounds(lower, upper)
+        if start == 0 and stop == self.valid:
+            return None
+        # Scatter whichever side of the range touches fewer rows.
+        if stop - start < self.size // 2:
+            mask = np.zeros(self.size, bool)
+            mask[self.order[start:stop]] = True
+        else:
+            mask = np.ones(self.size, bool)
+            mask[self.order[:start]] = False
+            mask[self.order[stop:]] = False
+        return mask
+
+    def contains(self, rows, lower, upper):
+        """Which of `rows` are in range, None if all values are."""
+
+        start, stop = self._bounds(lower, upper)
+        if start == 0 and stop == self.valid:
+            return None
+        values = self.raw[rows]
+        return (values >= lower) & (values <= upper)
+
+
+class BitmapIndex:
+    """One row bitmap per distinct value of a categorical column."""
+
+    def __init__(self, series):
+        self.codes, uniques = pd.factorize(series)
+        self.size = len(self.codes)
+        self.bitmaps = {
+            value: self.codes == code for code, value in enumerate(uniques)}
+        self.code = {value: code for code, value in enumerate(uniques)}
+        missing = self.codes == -1
+        self.missing = missing if missing.any() else None
+
+    def _covers(self, values):
+        return all(value in values for value in self.bitmaps)
+
+    def lookup(self, values):
+        """Bitmap of rows whose value is in `values`, None if all."""
+
+        if self._covers(values):
+            return None
+        keep = [value for value in self.bitmaps if value in values]
+        drop = [value for value in self.bitmaps if value not in values]
+        if len(keep) <= len(drop):
+            mask = np.zeros(self.size, bool)
+            for value in keep:
+                mask |= self.bitmaps[value]
+        else:
+            mask = np.ones(self.size, bool)
+            for value in drop:
+                mask &= ~self.bitmaps[value]
+            if self.missing is not None:
+                mask &= ~self.missing
+        return mask
+
+    def contains(self, rows, values):
+        """Which of `rows` have a value in `values`, None if all rows do."""
+
+        if self._covers(values):
+            return None
+        codes = [self.code[value] for value in values if value in self.code]
+        return np.isin(self.codes[rows], codes)
+
+
+class FilterIndex:
+    """Filter engine over one (immutable) table."""
+
+    def __init__(self, frame, cache_size=CACHE):
+        self.frame = frame
+        self.size = len(frame)
+        self.cache_size = cache_size
+        self._indexes = {}
+        self._masks = OrderedDict()
+        self._last = None
+
+    def _index(self, column, predicate):
+        key = (column, isinstance(predicate, tuple))
+        index = self._indexes.get(key)
+        if index is None:
+            if isinstance(predicate, tuple):
+                index = RangeIndex(self.frame[column])
+            else:
+                index = BitmapIndex(self.frame[column])
+            self._indexes[key] = index
+        return index
+
+    def lookup(self, column, predicate):
+        """Bitmap of a single predicate, None if it keeps every row."""
+
+        if column not in self.frame.columns:
+            return None
+        predicate = _key(predicate)
+        key = (column, predicate)
+        if key in self._masks:
+            self._masks.move_to_end(key)
+            return self._masks[key]
+
+        index = self._index(column, predicate)
+        if isinstance(predicate, tuple):
+            mask = index.lookup(*predicate)
+        else:
+            mask = index.lookup(predicate)
+        if mask is not None:
+            mask.flags.writeable = False
+        self._masks[key] = mask
+        if len(self._masks) > self.cache_size:
+            self._masks.popitem(last=False)
+        return mask
+
+    def _refine(self, result, column, predicate):
+        rows = np.flatnonzero(result)
+        index = self._index(column, predicate)
+        if isinstance(predicate, tuple):
+            keep = index.contains(rows, *predicate)
+        else:
+            keep = index.contains(rows, predicate)
+        if keep is None:
+            return result
+        mask = np.zeros(self.size, bool)
+        mask[rows[keep]] = True
+        return mask
+
+    def query(self, predicates, cancelled=None):
+        """Boolean row mask matching all `predicates`.
+
+        `cancelled` is polled between predicates; once it returns True the
+        query stops and returns None.
+        """
+
+        predicates = {
+            column: _key(predicate)
+            for column, predicate in predicates.items()
+            if column in self.frame.columns
+        }
+        if self._last is not None:
+            last, result = self._last
+            if last == predicates:
+                return result
+            changed = [
+                column for column in predicates
+                if last.get(column) != predicates[column]]
+            if (last.keys() == predicates.keys() and len(changed) == 1
+                    and _narrows(last[changed[0]], predicates[changed[0]])):
+                column = changed[0]
+                mask = self._refine(result, column, predicates[column])
+                return self._remember(predicates, mask)
+
+        mask = None
+        for column, predicate in predicates.items():
+            if cancelled and cancelled():
+                return None
+            bitmap = self.lookup(column, predicate)
+            if bitmap is None:
+                continue
+            if mask is None:
+                mask = bitmap.copy()
+            else:
+                mask &= bitmap
+        if mask is None:
+            mask = np.ones(self.size, bool)
+        return self._remember(predicates, mask)
+
+    def _remember(self, predicates, mask):
+        mask.flags.writeable = False
+        self._last = (predicates, mask)
+        return mask
@@ -0,0 +1,98 @@
+# !/usr/bin/env python3
+
+"""Lazily formatted JSON for the Shell widget.
+
+`format_json` lays out a value like `json.dumps(value, indent=4)` but
+stops after a budget of lines; containers past the budget, and long
+containers past a page of items, are left as `More` placeholders that
+format their next part only when expanded.
+"""
+
+import json
+from itertools import islice
+
+INDENT = 4
+PAGE = 100
+LINES = 400
+TEXT = 2000
+
+
+class More:
+    """Unformatted rest of a container, from item `start` on."""
+
+    def __init__(self, value, start, level, keys=None):
+        self.value = value
+        self.start = start
+        self.level = level
+        # Keys of a dict value, listed once it is paged past the start.
+        self.keys = keys
+
+    @property
+    def text(self):
+        pad = ' ' * (INDENT * self.level)
+        count = len(self.value) - self.start
+        return f'{pad}... {count} more item{"s" * (count != 1)}\n'
+
+    def expand(self, page=PAGE, lines=LINES):
+        """Pieces of the next page, ending with a `More` if any is left."""
+
+        return list(_items(
+            self.value, self.start, self.level, page, [lines], self.keys))
+
+
+def format_json(value, page=PAGE, lines=LINES):
+    """Text pieces and `More` placeholders laying out `value`."""
+
+    return list(_value(value, '', 0, False, page, [lines]))
+
+
+def _scalar(value):
+    text = json.dumps(value, default=str)
+    if len(text) > TEXT:
+        text = f'{text[:TEXT]}... ({len(text)} chars)'
+    return text
+
+
+def _value(value, prefix, level, comma, page, budget):
+    pad = ' ' * (INDENT * level)
+    end = ',' if comma else ''
+    budget[0] -= 1
+    if isinstance(value, (dict, list)) and value:
+        opening, closing = '{}' if isinstance(value, dict) else '[]'
+        yield f'{pad}{prefix}{opening}\n'
+        if budget[0] > 0:
+            yield from _items(value, 0, level + 1, page, budget)
+        else:
+            yield More(value, 0, level + 1)
+        yield f'{pad}{closing}{end}\n'
+    else:
+        yield f'{pad}{prefix}{_scalar(value)}{end}\n'
+
+
+def _items(value, start, level, page, budget, keys=None):
+    """Pieces of the items of `value` from `start` on, a page at most.
+
+    Lists are sliced and dicts looked up by their list of `keys`, so a
+    page costs the same wherever it starts.
+    """
+
+    is_dict = isinstance(value, dict)
+    stop = min(start + page, len(value))
+    if is_dict:
+        if keys is None and start:
+            keys = list(value)
+        names = islice(value, stop) if keys is None else keys[start:stop]
+        items = ((key, value[key]) for key in names)
+    else:
+        items = value[start:stop]
+    for i, item in enumerate(items, start):
+        if budget[0] <= 0:
+            yield More(value, i, level, keys)
+            return
+        prefix = ''
+        if is_dict:
+            key, item = item
+            prefix = f'{json.dumps(str(key))}: '
+        yield from _value(item, prefix, level, i < len(value) - 1, page, budget)
+    if stop < len(value):
+        yield More(value, stop, level, keys)
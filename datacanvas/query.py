@@ -0,0 +1,268 @@
+# !/usr/bin/env python3
+
+"""Expression queries over any column of the results table.
+
+An expression is a boolean formula over the flattened (`json_normalize`)
+columns, written like Python:
+
+    faces.age >= 18 and faces.gender == 'Woman' and not pose.yaw > 30
+    faces.dominant_emotion in ['happy', 'neutral'] or quality > 80
+    abs(pose.yaw) < 15 and contains(file, 'batch-2')
+    col('faces.emotion.happy') > 0.5
+
+Supported are comparisons (also chained, `18 <= faces.age < 40`), `in`
+and `not in` a list of values, `and`, `or`, `not`, arithmetic and the
+functions in `FUNCTIONS`.
+
+Missing values never match. A comparison with a missing value is unknown
+rather than false, and stays unknown through `not` (three-valued logic,
+as in SQL): `not faces.age > 25` and `faces.age <= 25` select the same
+rows, neither one with a missing age. Use `isna` to select those.
+
+Expressions are parsed with `ast` and checked against this grammar, never
+evaluated as Python. Each one is compiled once into a tree of vectorized
+column operations, and compiled queries are cached by their text.
+"""
+
+import ast
+import functools
+import operator
+
+import numpy as np
+import pandas as pd
+
+CACHE = 64
+
+
+class QueryError(ValueError):
+    """Raised for an invalid expression or one that does not fit a table."""
+
+
+COMPARE = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+ARITHMETIC = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+UNARY = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+FUNCTIONS = {
+    'abs': abs,
+    'isna': pd.isna,
+    'notna': pd.notna,
+    'lower': lambda x: x.str.lower(),
+    'upper': lambda x: x.str.upper(),
+    'contains': lambda x, text: x.str.contains(text, regex=False),
+    'startswith': lambda x, text: x.str.startswith(text),
+    'endswith': lambda x, text: x.str.endswith(text),
+}
+
+
+def _logic(value):
+    """`value` as a nullable boolean array, or a scalar, missing as NA."""
+
+    if isinstance(value, pd.arrays.BooleanArray) or value is pd.NA:
+        return value
+    if isinstance(value, pd.Series):
+        if not (pd.api.types.is_bool_dtype(value) or value.dtype == object):
+            raise QueryError(
+                f'{value.dtype} values are not a condition, compare them')
+        return pd.array(value, dtype='boolean')
+    if isinstance(value, np.ndarray):
+        return pd.array(value, dtype='boolean')
+    return bool(value)
+
+
+def _unknown(result, *operands):
+    """`result` of a comparison, unknown where an operand is missing."""
+
+    result = _logic(result)
+    for operand in operands:
+        if isinstance(operand, pd.Series):
+            missing = operand.isna().to_numpy()
+            if missing.any():
+                result = result.copy()
+                result[missing] = pd.NA
+        elif operand is None or (
+                isinstance(operand, float) and np.isnan(operand)):
+            return pd.NA
+    return result
+
+
+def _not(value):
+    return value if value is pd.NA else (
+        ~value if isinstance(value, pd.arrays.BooleanArray) else not value)
+
+
+def _isin(left, right):
+    if isinstance(left, pd.Series):
+        return left.isin(right)
+    return left in right
+
+
+def _name(node):
+    """Dotted column name of a name or attribute chain, else None."""
+
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        parent = _name(node.value)
+        return parent and f'{parent}.{node.attr}'
+    return None
+
+
+def _values(node):
+    """Constant values of the list on the right of `in`."""
+
+    if not isinstance(node, (ast.List, ast.Tuple, ast.Set)) or not all(
+            isinstance(item, ast.Constant) for item in node.elts):
+        raise QueryError('`in` needs a list of values, e.g. [1, 2]')
+    return [item.value for item in node.elts]
+
+
+def _column(name, columns):
+    columns.add(name)
+    return lambda frame: frame[name]
+
+
+def _compile(node, columns):
+    """Closure evaluating `node` on a table; adds column names to `columns`."""
+
+    name = _name(node)
+    if name is not None:
+        return _column(name, columns)
+
+    if isinstance(node, ast.Constant):
+        value = node.value
+        # Numbers as float64: constant arithmetic on Python ints is
+        # unbounded (`2 ** 10 ** 10` would hold the GIL for ever).
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = np.float64(value)
+        return lambda frame: value
+
+    if isinstance(node, ast.BoolOp):
+        operands = [_compile(value, columns) for value in node.values]
+        combine = (operator.and_ if isinstance(node.op, ast.And)
+                   else operator.or_)
+        return lambda frame: functools.reduce(
+            combine, (_logic(operand(frame)) for operand in operands))
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _compile(node.operand, columns)
+        if isinstance(node.op, ast.Not):
+            return lambda frame: _not(_logic(operand(frame)))
+        if type(node.op) in UNARY:
+            op = UNARY[type(node.op)]
+            return lambda frame: op(operand(frame))
+
+    if isinstance(node, ast.BinOp) and type(node.op) in ARITHMETIC:
+        op = ARITHMETIC[type(node.op)]
+        left = _compile(node.left, columns)
+        right = _compile(node.right, columns)
+        return lambda frame: op(left(frame), right(frame))
+
+    if isinstance(node, ast.Compare):
+        return _compare(node, columns)
+
+    if isinstance(node, ast.Call):
+        return _call(node, columns)
+
+    raise QueryError(f'unsupported expression: {ast.unparse(node)}')
+
+
+def _compare(node, columns):
+    operands = [_compile(node.left, columns)]
+    tests = []
+    for op, comparator in zip(node.ops, node.comparators):
+        if isinstance(op, (ast.In, ast.NotIn)):
+            values = _values(comparator)
+            operands.append(lambda frame, values=values: values)
+            tests.append(_isin if isinstance(op, ast.In) else (
+                lambda left, right: _not(_logic(_isin(left, right)))))
+        elif type(op) in COMPARE:
+            operands.append(_compile(comparator, columns))
+            tests.append(COMPARE[type(op)])
+        else:
+            raise QueryError(f'unsupported comparison: {ast.unparse(node)}')
+
+    def compare(frame):
+        values = [operand(frame) for operand in operands]
+        mask = True
+        for test, left, right in zip(tests, values, values[1:]):
+            mask = mask & _unknown(test(left, right), left, right)
+        return mask
+    return compare
+
+
+def _call(node, columns):
+    name = node.func.id if isinstance(node.func, ast.Name) else None
+    if node.keywords:
+        raise QueryError(f'{name or "functions"} takes no keyword arguments')
+    if name == 'col':
+        if len(node.args) != 1 or not isinstance(node.args[0], ast.Constant):
+            raise QueryError("col takes a column name, e.g. col('quality')")
+        return _column(str(node.args[0].value), columns)
+    if name not in FUNCTIONS:
+        raise QueryError(
+            f"unknown function {name or ast.unparse(node.func)}, "
+            f"use one of {', '.join(['col', *FUNCTIONS])}")
+    func = FUNCTIONS[name]
+    args = [_compile(arg, columns) for arg in node.args]
+    return lambda frame: func(*(arg(frame) for arg in args))
+
+
+class Query:
+    """A compiled expression; call it with a table to get its row mask."""
+
+    def __init__(self, text, func, columns):
+        self.text = text
+        self.columns = columns
+        self._func = func
+
+    def __repr__(self):
+        return f'Query({self.text!r})'
+
+    def __call__(self, frame):
+        """Boolean row mask of `frame` matching the expression."""
+
+        missing = sorted(self.columns.difference(frame.columns))
+        if missing:
+            raise QueryError(f"unknown column {', '.join(missing)}")
+        try:
+            # Overflow and division by zero give inf and nan, as in numpy.
+            with np.errstate(all='ignore'):
+                mask = _logic(self._func(frame))
+        except (TypeError, ValueError, AttributeError, ArithmeticError,
+                MemoryError) as error:
+            if isinstance(error, QueryError):
+                raise
+            raise QueryError(f'{self.text}: {error}') from error
+        if isinstance(mask, pd.arrays.BooleanArray):
+            return mask.to_numpy(dtype=bool, na_value=False)
+        return np.full(len(frame), mask is True)
+
+
+@functools.lru_cache(maxsize=CACHE)
+def compile_query(text):
+    """Parse and check `text` into a `Query`, raising `QueryError`."""
+
+    try:
+        tree = ast.parse(text.strip(), mode='eval')
+    except SyntaxError as error:
+        raise QueryError(f'invalid query: {error.msg}') from None
+    columns = set()
+    func = _compile(tree.body, columns)
+    return Query(text, func, frozenset(columns))
@@ -0,0 +1,252 @@
+# !/usr/bin/env python3
+
+"""Vectorized aggregations behind the plots and statistics.
+
+The plots draw pre-aggregated counts, so their cost depends on the number
+of bins and categories rather than on the number of faces. The filter
+statistics are computed together in one vectorized pass, and both are
+kept per filter signature.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+MAX_BINS = 64
+CACHE = 32
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Summarized numeric columns, and categorical columns split by value.
+MEASURES = {'age': 'faces.age', 'quality': 'quality'}
+CATEGORIES = {
+    'gender': 'faces.gender',
+    'ethnicity': 'faces.dominant_race',
+    'emotion': 'faces.dominant_emotion',
+}
+
+
+def histogram(frame, x, hue, bins=None):
+    """Counts of `x` binned and split by the categories of `hue`.
+
+    Returns `(edges, categories, counts)` where `counts` has one row per
+    category and one column per bin. Rows missing `x` or `hue` are left
+    out, as in `sns.histplot`. Without `bins`, Sturges' rule picks the
+    number of equal-width bins.
+    """
+
+    if x not in frame or hue not in frame:
+        return np.array([0.0, 1.0]), [], np.zeros((0, 1), dtype=np.int64)
+
+    values = pd.to_numeric(frame[x], errors='coerce').to_numpy(
+        dtype=float, na_value=np.nan)
+    codes, categories = pd.factorize(frame[hue], sort=True)
+    keep = (codes >= 0) & np.isfinite(values)
+    values, codes = values[keep], codes[keep]
+    if not len(values):
+        return np.array([0.0, 1.0]), [], np.zeros((0, 1), dtype=np.int64)
+
+    lower, upper = values.min(), values.max()
+    if lower == upper:
+        lower, upper = lower - 0.5, upper + 0.5
+    if bins is None:
+        bins = min(int(np.ceil(np.log2(len(values)))) + 1, MAX_BINS)
+    edges = np.linspace(lower, upper, bins + 1)
+
+    position = (values - lower) * (bins / (upper - lower))
+    position = np.clip(position.astype(np.int64), 0, bins - 1)
+    counts = np.bincount(
+        codes * bins + position, minlength=len(categories) * bins)
+    return edges, list(categories), counts.reshape(len(categories), bins)
+
+
+def plot_histogram(ax, edges, categories, counts, x=None, hue=None):
+    """Draw `histogram` counts on `ax` as stacked bars.
+
+    Bars drawn by an earlier call are moved in place if the categories
+    and the number of bins are the same, otherwise `ax` is drawn anew.
+    """
+
+    widths = np.diff(edges)
+    bottom = np.zeros(len(widths), dtype=np.int64)
+    bars = ax.containers
+    if bars and [bar.get_label() for bar in bars] == list(
+            map(str, categories)) and all(
+            len(bar) == len(widths) for bar in bars):
+        for bar, row in zip(bars, counts):
+            for patch, *bounds in zip(bar, edges, bottom, widths, row):
+                patch.set_bounds(*bounds)
+            bottom += row
+        ax.relim()
+        ax.autoscale_view()
+    else:
+        ax.clear()
+        for category, row in zip(categories, counts):
+            ax.bar(edges[:-1], row, widths, bottom=bottom.copy(),
+                   align='edge', label=str(category), linewidth=0)
+            bottom += row
+        if categories:
+            ax.legend(title=hue)
+    ax.set_xlabel(x or '')
+    ax.set_ylabel('Count')
+    return ax
+
+
+def restyle(figure):
+    """Rebuild the axes of `figure` in the current matplotlib style.
+
+    Clearing the axes keeps their face and spine colors, so a figure is
+    rebuilt after a theme change. Returns the new axes.
+    """
+
+    from matplotlib import rcParams
+
+    figure.set_facecolor(rcParams['figure.facecolor'])
+    figure.clear()
+    return figure.add_subplot()
+
+
+def _numeric(frame, column):
+    if column not in frame:
+        return None
+    return pd.to_numeric(frame[column], errors='coerce').to_numpy(
+        dtype=float, na_value=np.nan)
+
+
+def _describe(values):
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return None
+    percentiles = np.percentile(values, PERCENTILES)
+    return {
+        'count': len(values),
+        'mean': float(values.mean()),
+        'percentiles': dict(zip(PERCENTILES, percentiles.tolist())),
+    }
+
+
+def summary(frame):
+    """Summary statistics of a filtered frame.
+
+    Returns a dict with the file and face counts, count, mean and
+    percentiles of each of `MEASURES`, and for each of `CATEGORIES` the
+    share of every value with the mean of each measure within it.
+    Missing columns are left out.
+    """
+
+    result = {'faces': len(frame)}
+    if 'file' in frame:
+        result['files'] = int(frame['file'].nunique())
+
+    measures = {}
+    for name, column in MEASURES.items():
+        values = _numeric(frame, column)
+        if values is not None:
+            measures[name] = values
+            described = _describe(values)
+            if described:
+                result[name] = described
+
+    for name, column in CATEGORIES.items():
+        if column not in frame:
+            continue
+        codes, categories = pd.factorize(frame[column], sort=True)
+        valid = codes >= 0
+        counts = np.bincount(codes[valid], minlength=len(categories))
+        total = counts.sum()
+        groups = {
+            category: {'count': int(count), 'share': count / total}
+            for category, count in zip(categories, counts)}
+        for measure, values in measures.items():
+            known = valid & np.isfinite(values)
+            sums = np.bincount(
+                codes[known], values[known], minlength=len(categories))
+            sizes = np.bincount(codes[known], minlength=len(categories))
+            for category, value, size in zip(categories, sums, sizes):
+                groups[category][measure] = value / size if size else None
+        # Most frequent first, like `value_counts`.
+        result[name] = dict(sorted(
+            groups.items(), key=lambda item: -item[1]['count']))
+    return result
+
+
+def format_summary(stat):
+    """`summary` as text blocks, one per statistic."""
+
+    lines = []
+    if 'files' in stat:
+        lines.append(f"> File count:\n{stat['files']}")
+    lines.append(f"> Face count:\n{stat['faces']}")
+    for name in MEASURES:
+        if name in stat:
+            described = stat[name]
+            percentiles = ', '.join(
+                f"p{p}: {v:.1f}" for p, v in described['percentiles'].items())
+            lines.append(
+                f"> {name.capitalize()}:\n"
+                f"mean: {described['mean']:.1f}\n{percentiles}")
+    for name in CATEGORIES:
+        if name in stat:
+            rows = []
+            for category, group in stat[name].items():
+                row = f"{category:<16} {group['share']:.3f}"
+                for measure in MEASURES:
+                    if group.get(measure) is not None:
+                        row += f"  {measure} {group[measure]:.1f}"
+                rows.append(row)
+            lines.append(f"> {name.capitalize()}:\n" + '\n'.join(rows))
+    return lines
+
+
+class SummaryCache:
+    """LRU of `summary` and `histogram` results keyed by filter signature.
+
+    Switching back to an earlier filter, or to a plot tab drawn for it,
+    reuses its aggregates instead of another pass over the table.
+    """
+
+    def __init__(self, size=CACHE):
+        self.size = size
+        self._summaries = OrderedDict()
+
+    def _cached(self, key, compute):
+        if key in self._summaries:
+            self._summaries.move_to_end(key)
+            return self._summaries[key]
+        result = self._summaries[key] = compute()
+        while len(self._summaries) > self.size:
+            self._summaries.popitem(last=False)
+        return result
+
+    def summary(self, key, frame):
+        if key is None:
+            return summary(frame)
+        return self._cached(key, lambda: summary(frame))
+
+    def histogram(self, key, frame, x, hue):
+        if key is None:
+            return histogram(frame, x, hue)
+        return self._cached(
+            (key, x, hue), lambda: histogram(frame, x, hue))
+
+    def format(self, key, frame):
+        """Text of the statistics of `frame`, see `format_summary`."""
+
+        return format_summary(self.summary(key, frame))
+
+    def plot(self, key, frame, x, hue, ax=None):
+        """Draw the histogram of `x` by `hue` on `ax`, returns its figure.
+
+        Without `ax` it is drawn on a new standalone Figure, which is not
+        tracked by pyplot and so is freed with its last reference.
+        """
+
+        from matplotlib.figure import Figure
+
+        if ax is None:
+            ax = Figure().add_subplot()
+        plot_histogram(ax, *self.histogram(key, frame, x, hue), x, hue)
+        return ax.figure
+
+    def clear(self):
+        self._summaries.clear()
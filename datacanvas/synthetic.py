@@ -0,0 +1,116 @@
+# !/usr/bin/env python3
+
+"""Synthetic results files and images for benchmarks and tests.
+
+`make_results` writes a results file in the `{"metadata", "output"}`
+schema with random faces; `make_images` writes the matching images.
+Attribute distributions can be skewed with `weights`, e.g.
+`{'gender': {'Man': 3, 'Woman': 1}}`.
+"""
+
+import io
+import os
+
+import numpy as np
+
+from datacanvas.worker import EMOTIONS, GENDERS, RACES, write_results
+
+SIZE = (640, 480)
+VARIANTS = 16
+
+ATTRIBUTES = {
+    'gender': GENDERS,
+    'dominant_race': RACES,
+    'dominant_emotion': EMOTIONS,
+}
+
+
+def _choice(rng, values, weights, count):
+    if weights:
+        p = np.array([weights.get(value, 0) for value in values], dtype=float)
+        return rng.choice(values, count, p=p / p.sum())
+    return rng.choice(values, count)
+
+
+def make_faces(count, seed=0, ages=(35, 12), weights=None):
+    """Columns of `count` random faces, as numpy arrays by attribute."""
+
+    rng = np.random.default_rng(seed)
+    weights = weights or {}
+    faces = {
+        'confidence': rng.uniform(0.5, 1, count).round(3),
+        'age': rng.normal(*ages, count).clip(1, 99).round(),
+        'iris_distance': rng.uniform(20, 120, count).round(1),
+        'quality': (rng.beta(4, 2, count) * 100).round(2),
+        'yaw': rng.integers(-60, 61, count),
+        'pitch': rng.integers(-60, 61, count),
+        'roll': rng.integers(-60, 61, count),
+    }
+    for name, values in ATTRIBUTES.items():
+        key = name.replace('dominant_', '')
+        faces[name] = _choice(rng, values, weights.get(key), count)
+    return faces
+
+
+def make_results(path, images=1000, faces=(1, 3), seed=0, folder='images',
+                 size=SIZE, ages=(35, 12), weights=None):
+    """Write a results file of `images` images with `faces` faces each.
+
+    `faces` is the inclusive range of faces per image. Image paths are
+    `<folder>/<n>.jpg`. Returns the list of image paths.
+    """
+
+    rng = np.random.default_rng(seed)
+    counts = rng.integers(faces[0], faces[1] + 1, images)
+    files = [os.path.join(folder, f'{i:07d}.jpg') for i in range(images)]
+    columns = make_faces(int(counts.sum()), seed + 1, ages, weights)
+    owners = np.repeat(np.arange(images), counts)
+
+    def records():
+        for i, owner in enumerate(owners.tolist()):
+            yield {
+                'file': files[owner],
+                'faces': {
+                    'confidence': float(columns['confidence'][i]),
+                    'age': int(columns['age'][i]),
+                    'gender': str(columns['gender'][i]),
+                    'dominant_race': str(columns['dominant_race'][i]),
+                    'dominant_emotion': str(columns['dominant_emotion'][i]),
+                    'iris_distance': float(columns['iris_distance'][i]),
+                    'region': {'x': 0, 'y': 0, 'w': size[0], 'h': size[1]},
+                },
+                'pose': {
+                    'yaw': int(columns['yaw'][i]),
+                    'pitch': int(columns['pitch'][i]),
+                    'roll': int(columns['roll'][i]),
+                },
+                'quality': float(columns['quality'][i]),
+            }
+
+    metadata = {
+        'folder': folder,
+        'files': files,
+        'flag': {'analyzer': 'synthetic', 'seed': seed},
+        'errors': {},
+    }
+    write_results(path, metadata, records())
+    return files
+
+
+def make_images(paths, size=SIZE, seed=0, variants=VARIANTS):
+    """Write a JPEG at each of `paths`, cycling through a few noise images."""
+
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    encoded = []
+    for _ in range(min(variants, len(paths))):
+        pixels = rng.integers(0, 256, (size[1] // 8, size[0] // 8, 3), np.uint8)
+        image = Image.fromarray(pixels).resize(size)
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=85)
+        encoded.append(buffer.getvalue())
+    for i, path in enumerate(paths):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(encoded[i % len(encoded)])
@@ -1,12 +1,15 @@
 # Copyright © 2021 rdbende <rdbende@gmail.com>
 
+# The dark theme and its images are only loaded once it is first used.
 source datacanvas/theme/light.tcl
-source datacanvas/theme/dark.tcl
 
 option add *tearOff 0
 
 proc set_theme {mode} {
 	if {$mode == "dark"} {
+		if {[lsearch -exact [ttk::style theme names] "sun-valley-dark"] < 0} {
+			uplevel #0 {source datacanvas/theme/dark.tcl}
+		}
 		ttk::style theme use "sun-valley-dark"
 
 		array set colors {
@@ -0,0 +1,207 @@
+# !/usr/bin/env python3
+
+"""Persistent, content-addressed thumbnail store.
+
+Thumbnails are stored once per distinct image content under
+`<root>/<digest[:2]>/<digest>.jpg`. An append-only `index.jsonl` maps
+path, size and mtime to the content digest, so known images are found
+without reading them again; it is compacted when loaded once most of its
+lines are superseded. Missing thumbnails are made on a pool of worker
+processes, started on the first request.
+
+The root defaults to `$DATACANVAS_THUMBS`, else `datacanvas/thumbs` in
+`$XDG_CACHE_HOME` (`~/.cache`).
+"""
+
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from queue import Queue
+from threading import Condition
+
+from PIL import Image
+
+from datacanvas.utils import digest
+
+THUMB = 128
+WORKERS = os.cpu_count() or 1
+# Index lines kept before superseded ones are worth compacting away.
+COMPACT = 1000
+
+
+def default_root():
+    """Store folder from the environment, see the module docstring."""
+
+    cache = (os.environ.get('XDG_CACHE_HOME')
+             or os.path.join(os.path.expanduser('~'), '.cache'))
+    return (os.environ.get('DATACANVAS_THUMBS')
+            or os.path.join(cache, 'datacanvas', 'thumbs'))
+
+
+def thumb_path(root, key):
+    return os.path.join(root, key[:2], f'{key}.jpg')
+
+
+def make_thumb(path, root, size=THUMB):
+    """Hash `path` and write its thumbnail if new; returns the digest."""
+
+    key = digest(path)
+    dest = thumb_path(root, key)
+    if not os.path.exists(dest):
+        with Image.open(path) as image:
+            image.draft('RGB', (size, size))
+            image.thumbnail((size, size))
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            temp = f'{dest}.{os.getpid()}.tmp'
+            image.convert('RGB').save(temp, 'JPEG', quality=85)
+            os.replace(temp, dest)
+    return key
+
+
+class ThumbStore:
+    """Thumbnail lookups plus background filling for the grid view.
+
+    `request` queues missing thumbnails on the process pool and cancels
+    queued ones no longer requested; finished ones are put on `ready` as
+    `(path, thumbnail file or None)`. Pool callbacks run on other threads,
+    so `_pending` is only touched under `_lock`.
+    """
+
+    def __init__(self, root=None, size=THUMB, workers=WORKERS):
+        self.root = root or default_root()
+        self.size = size
+        self.workers = workers
+        self.ready = Queue()
+        self._index = None
+        self._pending = {}
+        self._pool = None
+        self._lock = Condition()
+
+    def _load_index(self):
+        self._index = {}
+        lines = 0
+        path = os.path.join(self.root, 'index.jsonl')
+        try:
+            with open(path) as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._index[entry['path']] = entry
+        except OSError:
+            pass
+        if lines > max(COMPACT, 2 * len(self._index)):
+            self._compact(path)
+
+    def _compact(self, path):
+        temp = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(temp, 'w') as f:
+                for entry in self._index.values():
+                    f.write(json.dumps(entry) + '\n')
+            os.replace(temp, path)
+        except OSError:
+            pass
+
+    @property
+    def busy(self):
+        """Whether thumbnails are being made or waiting on `ready`."""
+
+        with self._lock:
+            return bool(self._pending) or not self.ready.empty()
+
+    @staticmethod
+    def _key(path):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def lookup(self, path):
+        """Thumbnail file of `path` if it is in the store, else None."""
+
+        if self._index is None:
+            self._load_index()
+        entry = self._index.get(path)
+        try:
+            if entry and (entry['size'], entry['mtime']) == self._key(path):
+                thumb = thumb_path(self.root, entry['digest'])
+                if os.path.exists(thumb):
+                    return thumb
+        except OSError:
+            pass
+        return None
+
+    def _record(self, path, key, stat):
+        entry = {'path': path, 'size': stat[0], 'mtime': stat[1], 'digest': key}
+        with self._lock:
+            self._index[path] = entry
+            os.makedirs(self.root, exist_ok=True)
+            with open(os.path.join(self.root, 'index.jsonl'), 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+
+    def request(self, paths, cancel=True):
+        """Make the thumbnails of `paths` that are missing, in background."""
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                self.workers, multiprocessing.get_context('spawn'))
+        if cancel:
+            wanted = set(paths)
+            with self._lock:
+                queued = list(self._pending.items())
+            for path, future in queued:
+                # The callback of a cancelled future drops it from `_pending`.
+                if path not in wanted:
+                    future.cancel()
+        for path in paths:
+            with self._lock:
+                if path in self._pending:
+                    continue
+            thumb = self.lookup(path)
+            if thumb:
+                self.ready.put((path, thumb))
+                continue
+            try:
+                stat = self._key(path)
+            except OSError:
+                self.ready.put((path, None))
+                continue
+            future = self._pool.submit(make_thumb, path, self.root, self.size)
+            with self._lock:
+                self._pending[path] = future
+            future.add_done_callback(
+                lambda future, path=path, stat=stat:
+                    self._finish(path, stat, future))
+
+    def _done(self, path, future):
+        with self._lock:
+            if self._pending.get(path) is future:
+                del self._pending[path]
+            self._lock.notify_all()
+
+    def _finish(self, path, stat, future):
+        if future.cancelled():
+            self._done(path, future)
+            return
+        try:
+            key = future.result()
+            self._record(path, key, stat)
+            thumb = thumb_path(self.root, key)
+        except Exception:
+            thumb = None
+        self.ready.put((path, thumb))
+        self._done(path, future)
+
+    def fill(self, paths):
+        """Make all missing thumbnails of `paths` and wait for them."""
+
+        self.request(paths, cancel=False)
+        with self._lock:
+            self._lock.wait_for(lambda: not self._pending)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
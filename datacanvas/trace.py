@@ -0,0 +1,131 @@
+# !/usr/bin/env python3
+
+"""Lightweight timing spans for finding where time goes.
+
+Wrap work in `span(name)` or decorate it with `traced(name)`. While
+tracing is off (the default) both cost a flag check; switch it on with
+`enable()` or the `DATACANVAS_TRACE=1` environment variable. `summary`
+gives the last and rolling mean duration per span, `export` writes the
+recorded spans as a Chrome trace (chrome://tracing, Perfetto).
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+WINDOW = 20
+EVENTS = 100_000
+
+_enabled = bool(os.environ.get('DATACANVAS_TRACE'))
+_lock = threading.Lock()
+_events = deque(maxlen=EVENTS)
+_durations = {}
+_last = None
+_null = nullcontext()
+
+
+def enable(flag=True):
+    global _enabled
+    _enabled = flag
+
+
+def enabled():
+    return _enabled
+
+
+def clear():
+    global _last
+    with _lock:
+        _events.clear()
+        _durations.clear()
+        _last = None
+
+
+def _record(name, start, end):
+    global _last
+    with _lock:
+        _events.append((name, start, end - start, threading.get_ident()))
+        _durations.setdefault(name, deque(maxlen=WINDOW)).append(end - start)
+        _last = name
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *_):
+        _record(self.name, self.start, time.perf_counter_ns())
+
+
+def span(name):
+    """Context manager timing its block as `name`, if tracing is on."""
+
+    return _Span(name) if _enabled else _null
+
+
+def traced(name=None):
+    """Decorator timing every call of a function, if tracing is on."""
+
+    def wrap(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _record(label, start, time.perf_counter_ns())
+        return call
+    return wrap
+
+
+def summary():
+    """`{name: {last, mean, count}}` in milliseconds over the last spans."""
+
+    with _lock:
+        return {
+            name: {
+                'last': durations[-1] / 1e6,
+                'mean': sum(durations) / len(durations) / 1e6,
+                'count': len(durations),
+            }
+            for name, durations in _durations.items()
+        }
+
+
+def last():
+    """Name of the span that finished last, or None."""
+
+    return _last
+
+
+def export(path):
+    """Write the recorded spans to `path` in the Chrome trace format."""
+
+    with _lock:
+        events = list(_events)
+    pid = os.getpid()
+    trace = {
+        'traceEvents': [
+            {'name': name, 'ph': 'X', 'ts': start / 1e3, 'dur': duration / 1e3,
+             'pid': pid, 'tid': tid}
+            for name, start, duration, tid in events
+        ],
+        'displayTimeUnit': 'ms',
+    }
+    with open(path, 'w') as f:
+        json.dump(trace, f)
+    return len(events)
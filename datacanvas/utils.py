@@ -1,3 +1,293 @@
 # !/usr/bin/env python3
 
-"""Helper functions for linking backend module."""
\ No newline at end of file
+"""Helper functions for linking backend module."""
+
+import codecs
+import glob
+import hashlib
+import json
+import os
+import re
+
+CHUNK = 1 << 20
+WHITESPACE = ' \t\n\r'
+# Text up to the next bracket outside a string, or a string left open.
+SKIP = re.compile(
+    r'(?:[^\[\]{}"]+|"[^"\\]*(?:\\.[^"\\]*)*")*', re.DOTALL)
+ROW = '_row'
+SOURCE = '_source'
+# Files next to a results file that are not results themselves.
+SIDECARS = ('.manifest.json',)
+# Saved view, see `Backend.save`.
+OUTPUT = 'output.json'
+
+
+def new_hasher():
+    return hashlib.blake2b(digest_size=20)
+
+
+def digest(path):
+    """Content hash of a file, computed in blocks."""
+
+    hasher = new_hasher()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(CHUNK), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def find_results(spec):
+    """Sorted results files named by `spec`: a file, a folder or a glob.
+
+    A folder or glob leaves out the `OUTPUT` of an earlier save, which
+    holds records of the other files again; name it to load it.
+    """
+
+    if os.path.isdir(spec):
+        paths = glob.glob(os.path.join(spec, '*.json'))
+    elif glob.has_magic(spec):
+        paths = glob.glob(spec)
+    else:
+        paths = [spec]
+    return sorted(
+        path for path in paths
+        if os.path.isfile(path) and not path.endswith(SIDECARS)
+        and (path == spec or os.path.basename(path) != OUTPUT))
+
+
+def merge_metadata(blocks):
+    """Merge the metadata of several results files into one.
+
+    Lists are concatenated and dicts merged; other values are kept if all
+    files agree and become the list of values per file otherwise.
+    """
+
+    merged = {}
+    for key in dict.fromkeys(key for block in blocks for key in block):
+        values = [block[key] for block in blocks if key in block]
+        if all(isinstance(value, list) for value in values):
+            merged[key] = [item for value in values for item in value]
+        elif all(isinstance(value, dict) for value in values):
+            merged[key] = {
+                name: item for value in values for name, item in value.items()}
+        elif all(value == values[0] for value in values):
+            merged[key] = values[0]
+        else:
+            merged[key] = values
+    return merged
+
+
+def flatten(record, prefix='', out=None):
+    """Flatten nested dicts into dotted keys, like `pd.json_normalize`."""
+
+    if out is None:
+        out = {}
+    for key, value in record.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict) and value:
+            flatten(value, f'{name}.', out)
+        else:
+            out[name] = value
+    return out
+
+
+def unflatten(row):
+    """Rebuild a nested record from dotted keys, dropping missing values."""
+
+    record = {}
+    for name, value in row.items():
+        if value is None or value != value:
+            continue
+        node = record
+        *parents, key = name.split('.')
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[key] = value
+    return record
+
+
+class RecordReader:
+    """Incremental reader for the record array of a results file.
+
+    Iterating yields the records of `key` one by one without loading the
+    whole file. The other top-level members (e.g. `metadata`) are decoded
+    as they are passed and collected in `fields`. An optional `hasher` is
+    fed every raw block read, and an optional `offsets` list gets the
+    `(start, end)` byte span of every record, see `read_record`.
+    """
+
+    def __init__(self, path, key='output', progress=None, hasher=None,
+                 offsets=None, chunk=CHUNK):
+        self.path = path
+        self.key = key
+        self.progress = progress
+        self.hasher = hasher
+        self.offsets = offsets
+        self.chunk = chunk
+        self.fields = {}
+        self._decoder = json.JSONDecoder()
+
+    def __iter__(self):
+        with open(self.path, 'rb') as self._file:
+            self._text = codecs.getincrementaldecoder('utf-8')()
+            self._buf = ''
+            self._pos = 0
+            # Byte position in the file of the character at `_cursor`.
+            self._cursor = 0
+            self._byte = 0
+            self._eof = False
+            self._read = 0
+            self._total = os.fstat(self._file.fileno()).st_size
+
+            self._expect('{')
+            if self._peek() == '}':
+                return
+            while True:
+                key = self._value()
+                self._expect(':')
+                if key == self.key:
+                    yield from self._array()
+                else:
+                    self.fields[key] = self._value()
+                if self._peek() == '}':
+                    break
+                self._expect(',')
+
+            # Drain trailing bytes so the hash covers the whole file.
+            while self.hasher and not self._eof:
+                self._refill()
+
+    def _array(self):
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            if self.offsets is None:
+                yield self._value()
+            else:
+                self._peek()
+                start = self._tell()
+                value = self._value()
+                self.offsets.append((start, self._tell()))
+                yield value
+            if self._peek() == ']':
+                self._pos += 1
+                return
+            self._expect(',')
+
+    def _tell(self):
+        """Byte position in the file of `_pos`."""
+
+        if self._pos > self._cursor:
+            text = self._buf[self._cursor:self._pos]
+            self._byte += len(text) if text.isascii() else len(text.encode())
+            self._cursor = self._pos
+        return self._byte
+
+    def _refill(self, size=None):
+        if self.offsets is not None:
+            self._tell()
+            self._cursor = 0
+        data = self._file.read(size or self.chunk)
+        self._eof = not data
+        self._read += len(data)
+        if self.hasher:
+            self.hasher.update(data)
+        self._buf = self._buf[self._pos:] + self._text.decode(data, self._eof)
+        self._pos = 0
+        if self.progress:
+            self.progress(self._read, self._total)
+
+    def _peek(self):
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf) or self._eof:
+                return self._buf[self._pos:self._pos + 1]
+            self._refill()
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise json.JSONDecodeError(
+                f'Expecting {char!r}', self._buf, self._pos)
+        self._pos += 1
+
+    def _scan(self):
+        """Read on until the container at `_pos` is complete.
+
+        The scan resumes where the last refill stopped it, so a value
+        spanning many chunks is read in linear time.
+        """
+
+        depth = 0
+        # Scanned length, unchanged by `_refill` moving `_pos` to 0.
+        scanned = 0
+        while True:
+            end = SKIP.match(self._buf, self._pos + scanned).end()
+            scanned = end - self._pos
+            char = self._buf[end:end + 1]
+            if char in ('', '"'):
+                # The text, or a string in it, continues in the next chunk.
+                # Read as much again as is pending, so the buffer is
+                # copied a logarithmic number of times.
+                if self._eof:
+                    return
+                self._refill(max(self.chunk, len(self._buf) - self._pos))
+                continue
+            scanned += 1
+            depth += 1 if char in '[{' else -1
+            if not depth:
+                return
+
+    def _value(self):
+        container = self._peek() in ('[', '{')
+        scanned = False
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # A number at the end of the buffer may still be truncated.
+                if end < len(self._buf) or self._eof or container:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof or scanned:
+                    raise
+            if container:
+                # Decode it again only once complete, not after every chunk.
+                self._scan()
+                scanned = True
+            else:
+                self._refill()
+
+
+def read_record(path, start, end):
+    """Parse the record at byte span `(start, end)` of a results file."""
+
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return json.loads(f.read(end - start))
+
+
+def read_columns(path, progress=None, hasher=None, offsets=None):
+    """Stream a results file into flat columns.
+
+    Returns a dict of equally long value lists keyed by the dotted
+    `json_normalize` column name, and the other top-level members.
+    """
+
+    reader = RecordReader(
+        path, progress=progress, hasher=hasher, offsets=offsets)
+    columns = {}
+    count = 0
+    for record in reader:
+        for name, value in flatten(record).items():
+            column = columns.get(name)
+            if column is None:
+                column = columns[name] = [None] * count
+            column.append(value)
+        count += 1
+        for column in columns.values():
+            if len(column) < count:
+                column.append(None)
+    return columns, reader.fields
@@ -0,0 +1,398 @@
+# !/usr/bin/env python3
+
+"""Image analysis pipeline behind `AsyncProcess`.
+
+Images in the task folder are decoded and analyzed in batches on a pool
+of worker processes, and the faces found are written as a results file
+in the `{"metadata", "output"}` schema read by `Backend`.
+
+Analyzers are looked up by name in `ANALYZERS` (see `register`) or given
+as `package.module:Class`. An analyzer is created once per worker process
+with the task flag and called with the decoded image and its path; it
+returns a list of face records. Faces without a `confidence` are kept
+whatever the `confidence` threshold.
+
+Runs are incremental. `task.json.manifest.json` keys every image in the
+results by path, size, mtime and, with the `hash` option, content hash,
+and each analyzed image is appended to `task.json.journal.jsonl` as soon
+as its batch completes. A run only analyzes images that are new, changed
+or not yet in the journal, then merges them into the results file. Both
+record a digest of the options that change the records (`SETTINGS`), and
+are not reused by a run with other settings.
+"""
+
+import functools
+import hashlib
+import importlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import suppress
+from datetime import datetime, timezone
+
+from PIL import Image, ImageFilter, ImageStat
+
+from datacanvas.utils import RecordReader, digest
+
+TYPE = ('.jpg', '.jpeg', '.png')
+WORKERS = os.cpu_count() or 1
+BATCH = 32
+
+GENDERS = ['Man', 'Woman']
+RACES = ['asian', 'indian', 'black', 'white',
+         'middle eastern', 'latino hispanic']
+EMOTIONS = ['angry', 'disgust', 'fear', 'happy', 'sad', 'surprise', 'neutral']
+
+# Task options and the face attribute each one switches.
+OPTIONS = {
+    'age': 'age',
+    'gender': 'gender',
+    'ethnicity': 'dominant_race',
+    'emotion': 'dominant_emotion',
+}
+
+# Task options that change the records, with their defaults.
+SETTINGS = {
+    'analyzer': 'pixel',
+    'confidence': 0.0,
+    'pose': True,
+    'quality': True,
+    **{option: True for option in OPTIONS},
+}
+
+ANALYZERS = {}
+
+
+def register(name):
+    """Class decorator adding an analyzer to `ANALYZERS`.
+
+    Worker processes are spawned, so they only see the analyzers
+    registered when their module is imported. `analyze` passes a name
+    on as the `package.module:Class` of its class, so the class must be
+    defined at the top level of an importable module.
+    """
+
+    def wrap(cls):
+        ANALYZERS[name] = cls
+        return cls
+    return wrap
+
+
+def get_analyzer(spec):
+    if spec in ANALYZERS:
+        return ANALYZERS[spec]
+    module, _, name = spec.partition(':')
+    return functools.reduce(
+        getattr, name.split('.'), importlib.import_module(module))
+
+
+def analyzer_spec(spec):
+    """`spec` as the `package.module:Class` a worker process can import."""
+
+    if spec not in ANALYZERS:
+        return spec
+    cls = ANALYZERS[spec]
+    return f'{cls.__module__}:{cls.__qualname__}'
+
+
+@register('pixel')
+class PixelAnalyzer:
+    """Deterministic stand-in for a face model, for offline runs and tests.
+
+    Reports one face per image covering the whole frame. Quality comes
+    from contrast and edge strength; the other attributes are derived from
+    a hash of the pixels, so the same image always gives the same record.
+    """
+
+    def __init__(self, flag):
+        self.flag = flag
+
+    def __call__(self, image, path):
+        gray = image.convert('L')
+        contrast = ImageStat.Stat(gray).stddev[0]
+        edges = ImageStat.Stat(gray.filter(ImageFilter.FIND_EDGES)).mean[0]
+        quality = min(100.0, round(contrast / 1.28 + edges, 2))
+
+        seed = hashlib.blake2b(
+            gray.resize((16, 16)).tobytes(), digest_size=8).digest()
+        width, height = image.size
+        return [{
+            'confidence': round(0.5 + seed[0] / 510, 3),
+            'age': 1 + seed[1] % 80,
+            'gender': GENDERS[seed[2] % len(GENDERS)],
+            'dominant_race': RACES[seed[3] % len(RACES)],
+            'dominant_emotion': EMOTIONS[seed[4] % len(EMOTIONS)],
+            'iris_distance': round(width * (0.1 + seed[5] / 2550), 1),
+            'region': {'x': 0, 'y': 0, 'w': width, 'h': height},
+            'pose': {
+                'yaw': seed[6] % 121 - 60,
+                'pitch': seed[7] % 121 - 60,
+                'roll': (seed[6] ^ seed[7]) % 121 - 60,
+            },
+            'quality': quality,
+        }]
+
+
+def find_images(folder):
+    """Sorted paths of all images below `folder`."""
+
+    images = []
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(TYPE):
+                images.append(os.path.join(root, name))
+    return images
+
+
+def to_record(path, face, flag):
+    """Arrange an analyzer face as an output record, honouring `flag`."""
+
+    face = dict(face)
+    pose = face.pop('pose', None)
+    quality = face.pop('quality', None)
+    for option, key in OPTIONS.items():
+        if not flag.get(option, True):
+            face.pop(key, None)
+
+    record = {'file': path, 'faces': face}
+    if pose is not None and flag.get('pose', True):
+        record['pose'] = pose
+    if quality is not None and flag.get('quality', True):
+        record['quality'] = quality
+    return record
+
+
+_analyzer = None
+_flag = None
+
+
+def _init(flag):
+    global _analyzer, _flag
+    _flag = flag
+    _analyzer = get_analyzer(flag.get('analyzer', 'pixel'))(flag)
+
+
+def _analyze(paths):
+    """Analyze a batch in a worker process.
+
+    Returns `[(path, records, error, hash)]`, the content hash only with
+    the `hash` option.
+    """
+
+    results = []
+    for path in paths:
+        hashed = None
+        try:
+            if _flag.get('hash'):
+                hashed = digest(path)
+            with Image.open(path) as image:
+                image.load()
+                faces = _analyzer(image, path)
+            threshold = _flag.get('confidence', 0)
+            records = [
+                to_record(path, face, _flag) for face in faces
+                if face.get('confidence', threshold) >= threshold]
+            results.append((path, records, None, hashed))
+        except Exception as error:
+            results.append(
+                (path, [], f'{type(error).__name__}: {error}', hashed))
+    return results
+
+
+def analyze(paths, flag, progress=None, cancelled=None):
+    """Analyze `paths` on a process pool, yielding the `_analyze` results.
+
+    Results arrive batch by batch in completion order.
+    """
+
+    workers = max(1, int(flag.get('workers', WORKERS)))
+    batch = max(1, int(flag.get('batch', BATCH)))
+    batches = [paths[i:i + batch] for i in range(0, len(paths), batch)]
+    done = 0
+    # The workers import the analyzer, see `register`.
+    flag = dict(
+        flag, analyzer=analyzer_spec(flag.get('analyzer', 'pixel')))
+    # Spawn so the pool never forks the Tk process.
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(workers, context, _init, (flag,)) as pool:
+        futures = [pool.submit(_analyze, paths) for paths in batches]
+        for future in as_completed(futures):
+            if cancelled and cancelled():
+                for pending in futures:
+                    pending.cancel()
+                return
+            for result in future.result():
+                yield result
+            done += len(future.result())
+            if progress:
+                progress(done, len(paths))
+
+
+def write_results(path, metadata, records, indent=None):
+    """Write a results file record by record, replacing it atomically.
+
+    Records are one per line, or laid out with `indent` if given. If
+    `records` raises, the previous file is left as it was.
+    """
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp = f'{path}.tmp'
+    try:
+        with open(temp, 'w') as f:
+            f.write('{\n"metadata": ')
+            json.dump(metadata, f, indent=indent)
+            f.write(',\n"output": [')
+            for i, record in enumerate(records):
+                f.write(',\n' if i else '\n')
+                json.dump(record, f, indent=indent)
+            f.write('\n]\n}\n')
+    except BaseException:
+        # `records` failed or was stopped, keep the previous file. The
+        # temporary file is missing if it could not be opened.
+        with suppress(FileNotFoundError):
+            os.remove(temp)
+        raise
+    os.replace(temp, path)
+
+
+def settings_key(flag):
+    """Digest of the options of `flag` that change the records."""
+
+    settings = {
+        name: flag.get(name, default) for name, default in SETTINGS.items()}
+    settings['confidence'] = float(settings['confidence'])
+    return hashlib.blake2b(
+        json.dumps(settings, sort_keys=True).encode(),
+        digest_size=8).hexdigest()
+
+
+def file_key(path, stat=None):
+    stat = stat or os.stat(path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+
+
+def is_current(path, key, entry, use_hash=False):
+    """Whether a checkpoint `entry` still describes the file at `path`."""
+
+    if entry is None or entry['size'] != key['size']:
+        return False
+    if entry['mtime'] == key['mtime']:
+        return True
+    # Touched but maybe unchanged, the content hash decides if it is known.
+    return use_hash and entry.get('hash') == digest(path)
+
+
+def read_manifest(out, settings):
+    """Checkpoint of the images merged into `out`.
+
+    Empty without results or if they were made with other `settings`.
+    """
+
+    if os.path.exists(out):
+        try:
+            with open(f'{out}.manifest.json') as f:
+                manifest = json.load(f)
+            if manifest.get('settings') == settings:
+                return manifest
+        except (OSError, ValueError):
+            pass
+    return {'settings': settings, 'files': {}}
+
+
+def read_journal(out, settings):
+    """Entries of an interrupted run with the same `settings`, by path.
+
+    A torn last line is skipped.
+    """
+
+    entries = {}
+    try:
+        with open(f'{out}.journal.jsonl') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if entry.get('settings') == settings:
+                    entries[entry['file']] = entry
+    except OSError:
+        pass
+    return entries
+
+
+def run_task(flag, out, progress=None, cancelled=None):
+    """Analyze the images of `flag['folder']` and merge results into `out`.
+
+    Returns the metadata written, with the failed images under `errors`,
+    or None if the task was cancelled. A cancelled or interrupted task
+    resumes from its journal on the next run.
+    """
+
+    use_hash = flag.get('hash', False)
+    settings = settings_key(flag)
+    paths = find_images(flag['folder'])
+    keys = {path: file_key(path) for path in paths}
+    manifest = read_manifest(out, settings)
+    journal = read_journal(out, settings)
+
+    kept = {
+        path for path in paths
+        if is_current(path, keys[path], manifest['files'].get(path), use_hash)}
+    done = {
+        path: entry for path, entry in journal.items()
+        if path in keys and path not in kept
+        and is_current(path, keys[path], entry['key'], use_hash)}
+    todo = [path for path in paths if path not in kept and path not in done]
+
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    with open(f'{out}.journal.jsonl', 'a') as f:
+        for path, records, error, hashed in analyze(
+                todo, flag, progress, cancelled):
+            key = dict(keys[path])
+            if hashed:
+                key['hash'] = hashed
+            entry = {
+                'file': path, 'settings': settings, 'key': key,
+                'records': records}
+            if error:
+                entry['error'] = error
+            f.write(json.dumps(entry) + '\n')
+            f.flush()
+            done[path] = entry
+    if cancelled and cancelled():
+        return None
+
+    errors = {path: entry['error'] for path, entry in done.items()
+              if 'error' in entry}
+    metadata = {
+        'folder': flag['folder'],
+        'files': paths,
+        'flag': flag,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'errors': errors,
+    }
+    write_results(out, metadata, _merge(out, kept, done, paths))
+
+    # Failed images stay out of the manifest so the next run retries them.
+    files = {path: manifest['files'][path] for path in kept}
+    files.update({path: entry['key'] for path, entry in done.items()
+                  if path not in errors})
+    with open(f'{out}.manifest.json.tmp', 'w') as f:
+        json.dump({'settings': settings, 'files': files}, f)
+    os.replace(f'{out}.manifest.json.tmp', f'{out}.manifest.json')
+    os.remove(f'{out}.journal.jsonl')
+    return metadata
+
+
+def _merge(out, kept, done, paths):
+    """Records of unchanged images from `out`, then the new ones in order."""
+
+    if kept:
+        for record in RecordReader(out):
+            if record.get('file') in kept:
+                yield record
+    for path in paths:
+        if path in done:
+            yield from done[path]['records']
@@ -23,7 +23,9 @@ setup(
         "Operating System :: OS Independent",
     ],
     install_requires=[
-        'seaborn',
+        'numpy',
+        'pandas',
+        'matplotlib',
         'Pillow'
     ],
     python_requires='>=3.10',
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def frame():
+    """Flattened results table of random faces, with missing values."""
+
+    rows = 1000
+    rng = np.random.default_rng(0)
+    quality = rng.uniform(0, 100, rows)
+    quality[::13] = np.nan
+    age = rng.integers(1, 90, rows).astype(float)
+    age[::17] = np.nan
+    return pd.DataFrame({
+        'quality': quality,
+        'faces.age': age,
+        'pose.yaw': rng.uniform(-90, 90, rows),
+        'faces.gender': rng.choice(['Man', 'Woman', None], rows),
+    })
+
+
+@pytest.fixture
+def make_images():
+    """Function writing `count` images to a new `folder`, distinct in size.
+
+    Image `i` is `64 + i` pixels wide. Returns their paths.
+    """
+
+    from PIL import Image
+
+    def make(folder, count=10, ext='.jpg'):
+        folder.mkdir()
+        paths = []
+        for i in range(count):
+            path = folder / f'{i}{ext}'
+            color = (40 * i % 256, 20, 255 - 40 * i % 256)
+            Image.new('RGB', (64 + i, 48), color).save(path)
+            paths.append(str(path))
+        return paths
+    return make
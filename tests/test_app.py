@@ -0,0 +1,99 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_avoids_heavy_modules():
+    # The window comes up before pandas, matplotlib and PIL are needed.
+    code = (
+        'import sys, datacanvas.app; '
+        'print(",".join(m for m in ("numpy", "pandas", "matplotlib", "PIL") '
+        'if m in sys.modules))')
+    result = subprocess.run(
+        [sys.executable, '-c', code], env=dict(os.environ, PYTHONPATH=ROOT),
+        check=True, capture_output=True, text=True)
+    assert result.stdout.strip() == ''
+
+
+class View:
+    def __init__(self):
+        self.messages = []
+        self.pending = []
+
+    def show_message(self, content):
+        self.messages.append(content)
+
+    def after(self, delay, func):
+        self.pending.append(func)
+
+
+def test_set_query_keeps_expression_on_error(tmp_path):
+    from datacanvas.app import Controller
+    from datacanvas.backend import Backend
+    from datacanvas.synthetic import make_results
+
+    backend = Backend()
+    backend.results = str(tmp_path / 'task.json')
+    make_results(backend.results, 20)
+    backend.load_results()
+    controller = Controller(backend, View())
+    controller.apply_filter = lambda: None
+
+    controller.set_query('quality > 50')
+    for text in ('missing > 1', 'faces.gender < 3', 'quality >'):
+        controller.set_query(text)
+    assert controller.expression == 'quality > 50'
+    assert len(controller.view.messages) == 3
+    controller.set_query(' ')
+    assert controller.expression is None
+
+
+def test_apply_filter_polls_once(tmp_path):
+    from datacanvas.app import Controller
+    from datacanvas.backend import Backend
+    from datacanvas.synthetic import make_results
+
+    backend = Backend()
+    backend.results = str(tmp_path / 'task.json')
+    make_results(backend.results, 20)
+    backend.load_results()
+    controller = Controller(backend, View())
+    controller.get_filter = lambda: {}
+    shown = []
+    controller._show_filter = lambda *view: shown.append(view)
+
+    for _ in range(3):
+        controller.apply_filter()
+    assert len(controller.view.pending) <= 1
+    while controller.view.pending:
+        controller.view.pending.pop()()
+        assert len(controller.view.pending) <= 1
+    assert len(shown) == 1
+    assert not controller._polling
+
+
+def test_narrower_filter_clamps_inspector(tmp_path):
+    from types import SimpleNamespace
+
+    from datacanvas.app import Controller, Inspector
+    from datacanvas.backend import Backend
+    from datacanvas.synthetic import make_results
+
+    backend = Backend()
+    backend.results = str(tmp_path / 'task.json')
+    make_results(backend.results, 20)
+    backend.load_results()
+    controller = Controller(backend, View())
+    shown = []
+    inspector = SimpleNamespace(
+        parent=SimpleNamespace(controller=controller), img_pointer=15,
+        display_image=lambda: shown.append(inspector.img_pointer))
+
+    backend.select(backend.base.index < 4)
+    Inspector.update_meta_list(inspector)
+    assert shown == [3]
+    backend.select(backend.base.index < 10)
+    Inspector.update_meta_list(inspector)
+    assert shown == [3, 3]
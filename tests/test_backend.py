@@ -0,0 +1,141 @@
+import json
+import os
+
+import pytest
+
+from datacanvas.backend import Backend, load_tables
+from datacanvas.utils import RecordReader, find_results
+
+RECORDS = [
+    {'file': f'{i}.jpg', 'quality': 10 * i,
+     'faces': {'age': 20 + i, 'gender': 'Man' if i % 2 else 'Woman',
+               'emotion': {'happy': 0.5}}}
+    for i in range(10)
+]
+
+
+def load(tmp_path):
+    path = tmp_path / 'task.json'
+    path.write_text(json.dumps({'metadata': {'files': []}, 'output': RECORDS}))
+    backend = Backend()
+    backend.results = str(path)
+    backend.load_results()
+    return backend
+
+
+def test_records_of_filtered_view(tmp_path):
+    for _ in range(2):
+        # The second load comes from the column cache.
+        backend = load(tmp_path)
+        backend.filter({'faces.gender': {'Man'}, 'quality': (0, 60)})
+        assert list(backend.records()) == RECORDS[1:7:2]
+        backend.model['remark'] = 'ok'
+        assert backend.record(1) == dict(RECORDS[3], remark='ok')
+
+
+def test_save_streams_view(tmp_path):
+    backend = load(tmp_path)
+    backend.filter({'faces.age': (25, 99)})
+    path = backend.save({'note': 1}, str(tmp_path), compact=True)
+    reader = RecordReader(path)
+    assert list(reader) == RECORDS[5:]
+    assert reader.fields == {'metadata': {'note': 1}}
+
+
+def test_load_folder_of_results(tmp_path):
+    for i in range(3):
+        metadata = {'files': [f'{i}.jpg'], 'folder': f'part{i}', 'flag': {}}
+        (tmp_path / f'part{i}.json').write_text(json.dumps(
+            {'metadata': metadata, 'output': RECORDS[3 * i:3 * i + 3]}))
+    (tmp_path / 'part0.json.manifest.json').write_text('{}')
+    # Parsed on the pool, memory-mapped from the caches it wrote after.
+    tables = load_tables(find_results(str(tmp_path)), workers=2)
+    assert [len(frame) for frame, _, _ in tables] == [3, 3, 3]
+    for spec in (tmp_path, tmp_path / 'part*.json'):
+        backend = Backend()
+        backend.results = str(spec)
+        backend.load_results()
+        assert len(backend.base) == 9
+        assert backend.info['files'] == ['0.jpg', '1.jpg', '2.jpg']
+        assert backend.info['folder'] == ['part0', 'part1', 'part2']
+        assert len(backend.info['sources']) == 3
+        backend.filter({'faces.gender': {'Man'}})
+        assert list(backend.records()) == RECORDS[1:9:2]
+        assert list(backend.model['_source'].cat.codes) == [0, 1, 1, 2]
+
+    # A saved view is not loaded with the files it came from.
+    output = backend.save({}, str(tmp_path))
+    assert find_results(str(tmp_path)) == backend.paths
+    assert find_results(output) == [output]
+
+
+def test_load_tables_raises_parse_error(tmp_path):
+    paths = []
+    for i in range(4):
+        path = tmp_path / f'part{i}.json'
+        path.write_text(json.dumps({'output': RECORDS[i:i + 1]}))
+        paths.append(str(path))
+    (tmp_path / 'part1.json').write_text('{"output": [{"file": ')
+    with pytest.raises(ValueError):
+        load_tables(paths, workers=2)
+
+
+def test_filter_by_expression(tmp_path):
+    backend = load(tmp_path)
+    backend.filter(
+        {'quality': (0, 60)}, "faces.gender == 'Man' or faces.age < 21")
+    assert list(backend.records()) == [RECORDS[0], *RECORDS[1:7:2]]
+
+
+def test_expression_mask_of_replaced_table(tmp_path):
+    backend = load(tmp_path)
+    old = backend.base
+    expression = "faces.gender == 'Man'"
+    (tmp_path / 'task.json').write_text(json.dumps(
+        {'metadata': {'files': []}, 'output': RECORDS[:4]}))
+    backend.load_results()
+    # A query still running on the old table stores its mask last.
+    backend.match(expression, old)
+    assert len(backend.match(expression)) == 4
+    assert list(backend.query({}, expression=expression).index) == [1, 3]
+
+
+def test_signature_of_reloaded_results(tmp_path):
+    backend = load(tmp_path)
+    key = backend.signature({'quality': (0, 60)}, 'quality > 5')
+    assert backend.signature({'quality': (0, 60)}, 'quality > 5') == key
+    assert backend.signature({'quality': (0, 50)}, 'quality > 5') != key
+    (tmp_path / 'task.json').write_text(json.dumps(
+        {'metadata': {'files': []}, 'output': RECORDS[:4]}))
+    backend.load_results()
+    assert backend.signature({'quality': (0, 60)}, 'quality > 5') != key
+
+
+def test_view_without_added_columns(tmp_path):
+    # `to_dict('records')` of no columns gives no rows, which once made
+    # `records` yield nothing for a plain view.
+    backend = load(tmp_path)
+    assert backend.record(0) == RECORDS[0]
+    path = backend.save({}, str(tmp_path))
+    assert list(RecordReader(path)) == RECORDS
+
+
+def test_missing_results_keep_loaded_ones(tmp_path):
+    backend = load(tmp_path)
+    backend.results = str(tmp_path / 'missing.json')
+    with pytest.raises(FileNotFoundError):
+        backend.load_results()
+    # Records still come from the loaded file, not the new path.
+    assert backend.record(2) == RECORDS[2]
+
+
+def test_cancelled_save_keeps_output(tmp_path):
+    backend = load(tmp_path)
+    path = backend.save({}, str(tmp_path))
+    before = open(path).read()
+    backend.filter({'quality': (0, 30)})
+    assert backend.save({}, str(tmp_path), cancelled=lambda: True) is None
+    assert open(path).read() == before
+    # No temporary file is left next to the output.
+    assert sorted(os.listdir(tmp_path)) == [
+        'output.json', 'task.json', 'task.json.cache']
@@ -0,0 +1,55 @@
+import json
+import os
+
+import pandas as pd
+
+from datacanvas import cache
+from datacanvas.utils import new_hasher, read_columns
+
+
+def write_results(path, age=31):
+    data = {
+        "metadata": {"files": "a/"},
+        "output": [
+            {"file": "1.jpg", "quality": 50.5,
+             "faces": {"age": age, "gender": "Man", "region": [1, 2]}},
+            {"file": "2.jpg", "quality": 20,
+             "faces": {"age": 40, "region": [3, 4]}},
+        ],
+    }
+    path.write_text(json.dumps(data))
+
+
+def parse(path):
+    hasher = new_hasher()
+    columns, fields = read_columns(path, hasher=hasher)
+    return pd.DataFrame(columns), fields, hasher.hexdigest()
+
+
+def test_roundtrip(tmp_path):
+    path = tmp_path / "task.json"
+    write_results(path)
+    frame, fields, digest = parse(path)
+    assert digest == cache.digest(path)
+    assert cache.load(path) is None
+
+    cache.store(path, frame, fields, digest, [(0, 5), (5, 9)])
+    cached, cached_fields, offsets = cache.load(path)
+    assert offsets.tolist() == [[0, 5], [5, 9]]
+    assert cached_fields == fields
+    assert cached["faces.age"].tolist() == frame["faces.age"].tolist()
+    assert cached["faces.gender"].isna().tolist() == [False, True]
+    assert cached["faces.region"].tolist() == [[1, 2], [3, 4]]
+
+
+def test_invalidated_on_change(tmp_path):
+    path = tmp_path / "task.json"
+    write_results(path)
+    cache.store(path, *parse(path))
+
+    # Same content with a new mtime keeps the cache.
+    os.utime(path, ns=(1, 1))
+    assert cache.load(path) is not None
+
+    write_results(path, age=32)
+    assert cache.load(path) is None
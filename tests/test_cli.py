@@ -0,0 +1,65 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from PIL import Image
+
+from datacanvas.cli import parser
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(*args, cwd):
+    """Run the CLI in a new interpreter, checking Tk is never imported."""
+
+    code = (
+        'import sys; from datacanvas import cli; cli.main(sys.argv[1:]); '
+        'assert "tkinter" not in sys.modules')
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run(
+        [sys.executable, '-c', code, *args], cwd=cwd, env=env, check=True,
+        capture_output=True, text=True)
+    return result.stdout
+
+
+def test_headless_commands(tmp_path):
+    (tmp_path / 'data').mkdir()
+    for i in range(6):
+        Image.new('RGB', (32, 32), (40 * i, 0, 0)).save(
+            tmp_path / 'data' / f'{i}.jpg')
+
+    result = json.loads(run(
+        'analyze', 'data', '-o', 'out/task.json', '--confidence', '0',
+        '--workers', '1', cwd=tmp_path))
+    assert result['files'] == 6 and not result['errors']
+
+    stat = json.loads(run('stats', 'out/task.json', cwd=tmp_path))
+    assert stat['files'] == 6
+    gender = next(iter(stat['gender']))
+    result = json.loads(run(
+        'filter', 'out/task.json', '--gender', gender, cwd=tmp_path))
+    assert result['rows'] == stat['gender'][gender]['count']
+    result = json.loads(run(
+        'filter', 'out/task.json', '--query', f"faces.gender != '{gender}'",
+        cwd=tmp_path))
+    assert result['rows'] == stat['faces'] - stat['gender'][gender]['count']
+
+    report = json.loads(run(
+        'export', 'out/task.json', 'copy', '--age', '0', '200', cwd=tmp_path))
+    assert report['exported'] == 6
+    assert (tmp_path / 'copy' / 'output.json').exists()
+
+
+@pytest.mark.parametrize('args', [
+    ['analyze', 'data', '--workers', '0'],
+    ['analyze', 'data', '--batch', '-1'],
+    ['export', 'task.json', 'out', '--shard', '0'],
+    ['export', 'task.json', 'out', '--shard', 'many'],
+])
+def test_counts_must_be_positive(args, capsys):
+    with pytest.raises(SystemExit):
+        parser().parse_args(args)
+    assert 'argument --' in capsys.readouterr().err
@@ -0,0 +1,92 @@
+import json
+import os
+import tarfile
+
+import pytest
+
+from datacanvas.export import INDEX, export_images, export_shards
+
+
+@pytest.mark.parametrize('mode', ['copy', 'hardlink', 'reflink'])
+def test_export_and_skip_existing(tmp_path, make_images, mode):
+    paths = make_images(tmp_path / 'src')
+    dest = tmp_path / 'dest'
+    seen = []
+    report = export_images(
+        paths, dest, mode, workers=3, progress=lambda *a: seen.append(a))
+    assert report['exported'] == 10 and not report['failed']
+    assert seen[-1] == (10, 10)
+    assert (dest / '3.jpg').read_bytes() == open(paths[3], 'rb').read()
+    if mode == 'hardlink':
+        assert os.path.samefile(dest / '3.jpg', paths[3])
+
+    report = export_images(
+        paths + [str(tmp_path / 'gone.jpg')], dest, mode,
+        root=tmp_path / 'src')
+    assert report['skipped'] == 10 and len(report['failed']) == 1
+
+
+def test_export_cancelled(tmp_path, make_images):
+    paths = make_images(tmp_path / 'src')
+    report = export_images(paths, tmp_path / 'dest', cancelled=lambda: True)
+    assert report['cancelled'] and report['exported'] == 0
+
+
+def test_export_shards(tmp_path, make_images):
+    paths = make_images(tmp_path / 'src', count=7)
+    # Two faces in the first image, and one image that is gone.
+    records = [{'file': paths[0], 'faces': {'age': 1}, 'quality': 50}]
+    records += [{'file': path, 'faces': {'age': 2}} for path in paths]
+    records.append({'file': str(tmp_path / 'gone.jpg')})
+    dest = tmp_path / 'shards'
+    report = export_shards(records, dest, {'folder': 'src'}, shard=3, workers=2)
+    assert report['exported'] == 7 and len(report['failed']) == 1
+
+    with open(dest / INDEX) as f:
+        index = json.load(f)
+    assert [shard['samples'] for shard in index['shards']] == [3, 3, 1]
+    assert index['samples'] == 7 and index['metadata'] == {'folder': 'src'}
+    assert index['complete']
+    with tarfile.open(dest / index['shards'][0]['name']) as tar:
+        assert tar.getnames()[:2] == ['000000000.jpg', '000000000.json']
+        sample = json.load(tar.extractfile('000000000.json'))
+        assert sample == {'file': paths[0], 'faces': [{'age': 1}, {'age': 2}],
+                          'quality': [50, None]}
+        image = tar.extractfile('000000002.jpg').read()
+        assert image == open(paths[2], 'rb').read()
+
+
+def test_cancelled_shards_are_indexed(tmp_path, make_images):
+    paths = make_images(tmp_path / 'src', count=7)
+    records = [{'file': path, 'faces': {'age': 2}} for path in paths]
+    dest = tmp_path / 'shards'
+    checks = iter(range(100))
+    report = export_shards(
+        records, dest, shard=2, cancelled=lambda: next(checks) >= 5)
+    assert report['cancelled'] and report['exported'] == 4
+
+    with open(dest / INDEX) as f:
+        index = json.load(f)
+    assert not index['complete'] and index['samples'] == 4
+    assert [shard['first'] for shard in index['shards']] == [0, 2]
+    assert sorted(os.listdir(dest)) == [
+        INDEX, 'shard-000000.tar', 'shard-000001.tar']
+
+
+def test_export_same_names_from_different_folders(
+        tmp_path, make_images):
+    paths = make_images(tmp_path / 'a', count=3)
+    paths += make_images(tmp_path / 'b', count=2)
+    (tmp_path / 'b' / '0.jpg').write_bytes(b'x')
+    dest = tmp_path / 'dest'
+    report = export_images(paths + paths[:1], dest, workers=3)
+    assert report['exported'] == 5
+    assert (dest / 'a' / '0.jpg').read_bytes() == open(paths[0], 'rb').read()
+    assert (dest / 'b' / '0.jpg').read_bytes() == b'x'
+
+    # Same size but another image, so it is not taken as exported.
+    changed = tmp_path / 'a' / '1.jpg'
+    changed.write_bytes(bytes(changed.stat().st_size))
+    report = export_images(paths, dest)
+    assert (report['exported'], report['skipped']) == (1, 4)
+    assert (dest / 'a' / '1.jpg').read_bytes() == changed.read_bytes()
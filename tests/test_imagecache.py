@@ -0,0 +1,46 @@
+from PIL import Image, ImageOps
+
+from datacanvas.imagecache import ImageCache, load_display, load_region
+
+
+def test_budget_and_prefetch(tmp_path):
+    paths = []
+    for i in range(4):
+        path = tmp_path / f'{i}.png'
+        Image.new('RGB', (40 + i, 20)).save(path)
+        paths.append(str(path))
+
+    # Room for two padded 10x10 RGB images.
+    cache = ImageCache((10, 10), budget=2 * 300)
+    image, size = cache.get(paths[0])
+    assert image.size == (10, 10) and size == (40, 20)
+
+    cache.prefetch(paths[1:3])
+    cache._pool.shutdown(wait=True)
+    # Prefetches finish in any order, evicting the image seen first.
+    assert set(cache._images) == set(paths[1:3])
+    assert cache.get(paths[2])[1] == (42, 20)
+
+
+def test_reduced_decode_and_full_region(tmp_path, monkeypatch):
+    path = tmp_path / 'big.jpg'
+    image = Image.new('RGB', (1600, 800), 'white')
+    image.paste((255, 0, 0), (1500, 0, 1600, 100))
+    image.save(path)
+
+    # The decoded image, before padding, is an eighth of the original.
+    decoded = []
+    pad = ImageOps.pad
+
+    def spy(image, size):
+        decoded.append(image.size)
+        return pad(image, size)
+
+    monkeypatch.setattr(ImageOps, 'pad', spy)
+    padded, size = load_display(path, (200, 200))
+    assert padded.size == (200, 200) and size == (1600, 800)
+    assert decoded == [(200, 100)]
+
+    region, size = load_region(path, (100, 100), centre=(1, 0))
+    assert size == (1600, 800)
+    assert region.getpixel((50, 50))[0] > 200 > region.getpixel((50, 50))[1]
@@ -0,0 +1,83 @@
+import numpy as np
+
+from datacanvas.index import FilterIndex
+
+
+def test_query_matches_scan(frame):
+    index = FilterIndex(frame)
+    mask = index.query({
+        'faces.age': (20, 60),
+        'pose.yaw': (30, -30),
+        'faces.gender': {'Woman'},
+        'pose.roll': (-10, 10),
+    })
+    expected = (
+        frame['faces.age'].between(20, 60) &
+        frame['pose.yaw'].between(-30, 30) &
+        frame['faces.gender'].isin(['Woman'])
+    )
+    assert (mask == expected.to_numpy()).all()
+
+
+def scan(frame, predicates):
+    # A predicate excluding no known value keeps all rows, any other one
+    # drops the missing values too.
+    mask = np.ones(len(frame), bool)
+    for column, predicate in predicates.items():
+        series = frame[column]
+        if isinstance(predicate, tuple):
+            keep = series.between(*sorted(predicate))
+        else:
+            keep = series.isin(predicate)
+        if keep[series.notna()].all():
+            continue
+        mask &= keep.to_numpy()
+    return mask
+
+
+def test_unconstrained_predicates_keep_all_rows(frame):
+    index = FilterIndex(frame)
+    mask = index.query({'faces.age': (0, 999), 'pose.yaw': (-90, 90)})
+    assert mask.all()
+    assert index.query({'faces.gender': {'Man', 'Woman'}}).all()
+
+
+def test_missing_values_same_rule_for_ranges_and_sets(frame):
+    index = FilterIndex(frame)
+    low, high = frame['faces.age'].min(), frame['faces.age'].max()
+    missing = frame['faces.age'].isna() | frame['faces.gender'].isna()
+    for predicates in (
+            {'faces.age': (low, high), 'faces.gender': {'Man', 'Woman'}},
+            {'faces.age': (low + 1, high)},
+            {'faces.gender': {'Man'}},
+            {'faces.age': (low, high - 1), 'faces.gender': {'Man', 'Woman'}}):
+        # Fresh queries and ones refined from the last result agree.
+        for index in (FilterIndex(frame), index):
+            mask = index.query(predicates)
+            assert (mask == scan(frame, predicates)).all()
+    assert not mask[frame['faces.age'].isna()].any()
+    assert index.query({'faces.gender': {'Man', 'Woman'}})[missing].any()
+
+
+def test_incremental_queries_match_scan(frame):
+    index = FilterIndex(frame)
+    steps = [
+        {'faces.age': (10, 80), 'pose.yaw': (-60, 60), 'faces.gender': {'Man', 'Woman'}},
+        {'faces.age': (10, 80), 'pose.yaw': (-60, 20), 'faces.gender': {'Man', 'Woman'}},
+        {'faces.age': (10, 80), 'pose.yaw': (-60, 20), 'faces.gender': {'Man'}},
+        {'faces.age': (10, 80), 'pose.yaw': (-60, 50), 'faces.gender': {'Man'}},
+        {'faces.age': (10, 80), 'pose.yaw': (-60, 60), 'faces.gender': {'Man', 'Woman'}},
+    ]
+    for predicates in steps:
+        mask = index.query(predicates)
+        assert (mask == scan(frame, predicates)).all()
+    # The first query is served from the per-predicate cache.
+    assert index.lookup('pose.yaw', (-60, 60)) is index.lookup('pose.yaw', (60, -60))
+
+
+def test_predicates_of_filter_options():
+    from datacanvas.index import predicates
+
+    options = {'quality': [10, 90], 'gender': ['Man'], 'age': None, 'x': 1}
+    assert predicates(options) == {
+        'quality': (10, 90), 'faces.gender': {'Man'}}
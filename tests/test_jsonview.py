@@ -0,0 +1,41 @@
+import json
+
+from datacanvas.jsonview import More, format_json
+
+
+def render(pieces):
+    """Text of `pieces` with every placeholder expanded."""
+
+    text = []
+    for piece in pieces:
+        text.append(render(piece.expand()) if isinstance(piece, More) else piece)
+    return ''.join(text)
+
+
+def test_small_value_matches_json_dumps():
+    value = {'metadata': {'folder': 'a', 'flag': {'age': True}},
+             'files': ['a.jpg', 'b.jpg'], 'empty': [], 'count': 2}
+    pieces = format_json(value)
+    assert not any(isinstance(piece, More) for piece in pieces)
+    assert ''.join(pieces) == json.dumps(value, indent=4) + '\n'
+
+
+def test_large_value_is_paged():
+    value = {'files': [f'{i}.jpg' for i in range(1000)],
+             'nested': [{'x': list(range(50))} for _ in range(20)]}
+    pieces = format_json(value, page=100, lines=150)
+    text = [piece for piece in pieces if isinstance(piece, str)]
+    assert len(''.join(text).splitlines()) <= 160
+    assert pieces[-3].text.strip() == '... 19 more items'
+    assert render(pieces) == json.dumps(value, indent=4) + '\n'
+
+
+def test_large_dict_is_paged_by_keys():
+    value = {f'k{i}': [i, str(i)] for i in range(1000)}
+    pieces = format_json(value, page=100, lines=10000)
+    more = pieces[-2]
+    assert more.start == 100 and more.keys is None
+    following = more.expand(page=100)
+    assert following[-1].start == 200
+    assert following[-1].keys == list(value)
+    assert render(pieces) == json.dumps(value, indent=4) + '\n'
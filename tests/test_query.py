@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from datacanvas.query import QueryError, compile_query
+
+FRAME = pd.DataFrame({
+    'file': ['a/1.jpg', 'batch-2/2.jpg', 'a/3.jpg', 'batch-2/4.jpg'],
+    'quality': [10.0, 90.0, 50.0, 70.0],
+    'faces.age': [20.0, 30.0, np.nan, 50.0],
+    'faces.gender': ['Man', 'Woman', None, 'Woman'],
+    'pose.yaw': [-20, 5, 3, 40],
+})
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("faces.age >= 25 and faces.gender == 'Woman'", [0, 1, 0, 1]),
+    ('faces.age != 20', [0, 1, 0, 1]),
+    # Missing values stay out through `not`, as with the negated comparison.
+    ('not faces.age > 25', [1, 0, 0, 0]),
+    ('not faces.age == 20', [0, 1, 0, 1]),
+    ("not (faces.gender == 'Man' or quality > 60)", [0, 0, 0, 0]),
+    ("not (faces.gender == 'Man' and quality > 60)", [1, 1, 1, 1]),
+    ("faces.gender not in ['Man'] or isna(faces.age)", [0, 1, 1, 1]),
+    ('18 <= faces.age < 40', [1, 1, 0, 0]),
+    ("faces.gender not in ['Man']", [0, 1, 0, 1]),
+    ("abs(pose.yaw) < 15 or contains(file, 'batch')", [0, 1, 1, 1]),
+    ("isna(faces.age) or col('quality') / 2 > 40", [0, 1, 1, 0]),
+    ("startswith(lower(faces.gender), 'w')", [0, 1, 0, 1]),
+    # Constants are float64, so these overflow or divide to inf at once.
+    ('2 ** 10 ** 10 > quality', [1, 1, 1, 1]),
+    ('1 / 0 < quality', [0, 0, 0, 0]),
+])
+def test_expressions(text, expected):
+    assert compile_query(text)(FRAME).tolist() == [bool(x) for x in expected]
+
+
+@pytest.mark.parametrize('text', [
+    'quality >', "__import__('os')", 'quality.sum()', 'a if b else c',
+    'quality in other', 'quality', 'faces.gender < 3', 'missing > 1',
+    "'x' * 10 ** 10 == file",
+])
+def test_invalid_expressions(text):
+    with pytest.raises(QueryError):
+        compile_query(text)(FRAME)
+
+
+def test_compiled_once():
+    assert compile_query('quality > 1') is compile_query('quality > 1')
@@ -0,0 +1,107 @@
+import numpy as np
+
+from datacanvas.stats import (SummaryCache, histogram, plot_histogram,
+                              restyle, summary)
+
+
+def test_histogram_matches_numpy(frame):
+    edges, categories, counts = histogram(frame, 'quality', 'faces.gender')
+    assert categories == ['Man', 'Woman']
+    for category, row in zip(categories, counts):
+        values = frame.loc[frame['faces.gender'] == category, 'quality']
+        expected, _ = np.histogram(values.dropna(), edges)
+        assert (row == expected).all()
+
+
+def test_histogram_without_rows_or_columns(frame):
+    _, categories, counts = histogram(frame.iloc[:0], 'quality', 'faces.gender')
+    assert categories == [] and counts.sum() == 0
+    _, categories, _ = histogram(frame, 'quality', 'faces.dominant_race')
+    assert categories == []
+
+
+def test_summary_matches_pandas(frame):
+    frame['faces.age'] = np.arange(len(frame)) % 90
+    frame['file'] = [f'{i // 2}.jpg' for i in range(len(frame))]
+    stat = summary(frame)
+    assert stat['files'] == 500 and stat['faces'] == 1000
+    assert stat['age']['percentiles'][50] == frame['faces.age'].median()
+
+    shares = frame['faces.gender'].value_counts(normalize=True)
+    means = frame.groupby('faces.gender')['quality'].mean()
+    assert list(stat['gender']) == list(shares.index)
+    for gender, group in stat['gender'].items():
+        assert np.isclose(group['share'], shares[gender])
+        assert np.isclose(group['quality'], means[gender])
+    assert 'emotion' not in stat
+
+
+def test_summary_cache_by_signature(frame):
+    cache = SummaryCache(size=1)
+    first = cache.summary('a', frame)
+    assert cache.summary('a', frame.iloc[:0]) is first
+    cache.summary('b', frame)
+    assert cache.summary('a', frame.iloc[:0])['faces'] == 0
+
+
+def test_histogram_cache_by_signature(frame):
+    cache = SummaryCache(size=2)
+    first = cache.histogram('a', frame, 'quality', 'faces.gender')
+    assert cache.histogram(
+        'a', frame.iloc[:0], 'quality', 'faces.gender') is first
+    other = cache.histogram('a', frame.iloc[:0], 'faces.gender', 'quality')
+    assert other[1] == []
+    cache.summary('b', frame)
+    assert cache.histogram(
+        'a', frame.iloc[:0], 'quality', 'faces.gender')[1] == []
+
+
+def test_summary_cache_plots_cached_histogram(frame):
+    cache = SummaryCache()
+    figure = cache.plot('a', frame, 'quality', 'faces.gender')
+    ax = figure.axes[0]
+    assert [bar.get_label() for bar in ax.containers] == ['Man', 'Woman']
+    assert ax.get_xlabel() == 'quality'
+    # A cached histogram is drawn even if the view is gone.
+    empty = frame.iloc[:0]
+    assert cache.plot('a', empty, 'quality', 'faces.gender', ax) is figure
+    counted = frame[['quality', 'faces.gender']].notna().all(axis=1).sum()
+    assert sum(patch.get_height() for patch in ax.patches) == counted
+
+
+def test_plot_histogram_updates_bars_in_place(frame):
+    from matplotlib.figure import Figure
+
+    ax = Figure().add_subplot()
+    plot_histogram(ax, *histogram(frame, 'quality', 'faces.gender', bins=8))
+    patches = list(ax.patches)
+
+    edges, categories, counts = histogram(
+        frame.iloc[:100], 'quality', 'faces.gender', bins=8)
+    plot_histogram(ax, edges, categories, counts)
+    assert ax.patches[:] == patches
+    heights = [patch.get_height() for patch in patches]
+    assert heights == counts.ravel().tolist()
+    assert patches[8].get_y() == counts[0][0]
+    assert ax.get_ylim()[1] >= counts.sum(axis=0).max()
+
+    plot_histogram(ax, *histogram(frame, 'quality', 'faces.gender', bins=4))
+    assert len(ax.patches) == 8 and ax.patches[0] not in patches
+
+
+def test_restyle_after_theme_change(frame):
+    from matplotlib import style
+    from matplotlib.colors import to_rgba
+    from matplotlib.figure import Figure
+
+    with style.context('fivethirtyeight'):
+        figure = Figure()
+        plot_histogram(
+            figure.add_subplot(), *histogram(frame, 'quality', 'faces.gender'))
+    with style.context('dark_background'):
+        ax = restyle(figure)
+        plot_histogram(ax, *histogram(frame, 'quality', 'faces.gender'))
+        assert figure.axes == [ax]
+        assert ax.get_facecolor() == to_rgba('black')
+        assert figure.get_facecolor() == to_rgba('black')
+        assert ax.xaxis.label.get_color() == 'white'
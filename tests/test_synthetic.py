@@ -0,0 +1,20 @@
+from PIL import Image
+
+from datacanvas.synthetic import make_images, make_results
+from datacanvas.utils import read_columns
+
+
+def test_results_and_images(tmp_path):
+    path = tmp_path / 'task.json'
+    files = make_results(
+        path, images=50, faces=(2, 2), folder=str(tmp_path / 'img'),
+        weights={'gender': {'Woman': 1}})
+    columns, fields = read_columns(path)
+    assert len(columns['file']) == 100
+    assert set(columns['file']) == set(files) == set(fields['metadata']['files'])
+    assert set(columns['faces.gender']) == {'Woman'}
+    assert all(0 <= value <= 100 for value in columns['quality'])
+
+    make_images(files[:3], size=(64, 48))
+    with Image.open(files[2]) as image:
+        assert image.size == (64, 48)
@@ -0,0 +1,62 @@
+import os
+import threading
+
+from PIL import Image
+
+from datacanvas.thumbs import COMPACT, ThumbStore
+
+
+def test_fill_and_lookup(tmp_path):
+    folder = tmp_path / 'data'
+    folder.mkdir()
+    paths = []
+    for i, color in enumerate(['red', 'red', 'blue']):
+        path = folder / f'{i}.png'
+        Image.new('RGB', (300, 200), color).save(path)
+        paths.append(str(path))
+
+    store = ThumbStore(str(tmp_path / 'thumbs'), size=32, workers=2)
+    assert store.lookup(paths[0]) is None
+    store.fill(paths)
+    store.close()
+
+    thumbs = [store.lookup(path) for path in paths]
+    # Identical content shares one thumbnail.
+    assert thumbs[0] == thumbs[1] != thumbs[2]
+    with Image.open(thumbs[2]) as thumb:
+        assert thumb.size == (32, 21)
+
+    # A fresh store finds them through the index.
+    assert ThumbStore(str(tmp_path / 'thumbs')).lookup(paths[2]) == thumbs[2]
+    os.utime(paths[2], ns=(1, 1))
+    assert ThumbStore(str(tmp_path / 'thumbs')).lookup(paths[2]) is None
+
+
+def test_fill_after_cancelled_requests(tmp_path, make_images):
+    paths = make_images(tmp_path / 'data', 12, '.png')
+    store = ThumbStore(str(tmp_path / 'thumbs'), size=16, workers=1)
+    store.request(paths)
+    # Cancels the queued ones; fill must not wait for them.
+    store.request(paths[:1])
+    filler = threading.Thread(target=store.fill, args=(paths[:2],))
+    filler.start()
+    filler.join(30)
+    store.close()
+    assert not filler.is_alive()
+    assert store.lookup(paths[1])
+
+
+def test_index_compacted_and_root_from_environment(
+        tmp_path, monkeypatch, make_images):
+    paths = make_images(tmp_path / 'data', 2, '.png')
+    monkeypatch.setenv('DATACANVAS_THUMBS', str(tmp_path / 'thumbs'))
+    store = ThumbStore(size=16, workers=1)
+    store.fill(paths)
+    store.close()
+    index = tmp_path / 'thumbs' / 'index.jsonl'
+    line = index.read_text().splitlines()[0]
+    index.write_text((line + '\n') * (COMPACT + 1) + index.read_text())
+
+    store = ThumbStore(size=16)
+    assert all(store.lookup(path) for path in paths)
+    assert len(index.read_text().splitlines()) == 2
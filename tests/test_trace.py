@@ -0,0 +1,34 @@
+import json
+
+from datacanvas import trace
+
+
+def test_spans_only_when_enabled(tmp_path):
+    @trace.traced('work')
+    def work(value):
+        return value * 2
+
+    trace.clear()
+    trace.enable(False)
+    assert work(2) == 4
+    with trace.span('block'):
+        pass
+    assert trace.summary() == {} and trace.last() is None
+
+    trace.enable()
+    try:
+        for _ in range(3):
+            work(1)
+        with trace.span('block'):
+            pass
+    finally:
+        trace.enable(False)
+    summary = trace.summary()
+    assert summary['work']['count'] == 3 and trace.last() == 'block'
+    assert summary['work']['last'] >= 0
+
+    assert trace.export(tmp_path / 'trace.json') == 4
+    events = json.loads((tmp_path / 'trace.json').read_text())['traceEvents']
+    assert [event['name'] for event in events] == ['work'] * 3 + ['block']
+    assert all(event['ph'] == 'X' for event in events)
+    trace.clear()
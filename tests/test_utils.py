@@ -0,0 +1,108 @@
+import json
+
+import pandas as pd
+import pytest
+
+from datacanvas.utils import (RecordReader, merge_metadata, read_columns,
+                              read_record, unflatten)
+
+RECORDS = [
+    {
+        "file": "a/ü.jpg",
+        "quality": 61.5,
+        "faces": {"age": 31, "gender": "Man", "emotion": {"happy": 0.9}},
+        "pose": {"yaw": -12, "pitch": 3, "roll": 1234567},
+    },
+    {
+        "file": "a/2.jpg",
+        "quality": 40,
+        "faces": {"age": 25, "gender": "Woman", "region": [1, 2, 3, 4]},
+    },
+]
+
+
+def write_results(tmp_path, records=RECORDS):
+    path = tmp_path / "task.json"
+    data = {"output": records, "metadata": {"files": "a/", "n": 12345}}
+    path.write_text(json.dumps(data, indent=4, ensure_ascii=False))
+    return path
+
+
+def test_reader_small_chunks(tmp_path):
+    path = write_results(tmp_path)
+    reader = RecordReader(path, chunk=7)
+    assert list(reader) == RECORDS
+    assert reader.fields == {"metadata": {"files": "a/", "n": 12345}}
+
+
+def test_record_offsets(tmp_path):
+    path = write_results(tmp_path)
+    offsets = []
+    assert list(RecordReader(path, offsets=offsets, chunk=5)) == RECORDS
+    assert [read_record(path, *span) for span in offsets] == RECORDS
+
+
+def test_columns_match_json_normalize(tmp_path):
+    path = write_results(tmp_path)
+    columns, _ = read_columns(path)
+    expected = pd.json_normalize(RECORDS)
+    frame = pd.DataFrame(columns)
+    assert list(frame.columns) == list(expected.columns)
+    assert frame["faces.age"].tolist() == expected["faces.age"].tolist()
+    assert frame["faces.region"][1] == [1, 2, 3, 4]
+
+
+def test_unflatten_drops_missing():
+    row = {"file": "x.jpg", "faces.age": 3, "pose.yaw": float("nan")}
+    assert unflatten(row) == {"file": "x.jpg", "faces": {"age": 3}}
+
+
+def test_merge_metadata():
+    merged = merge_metadata([
+        {'files': ['a'], 'errors': {'a': 'x'}, 'folder': 'one', 'v': 1},
+        {'files': ['b'], 'errors': {}, 'folder': 'two', 'v': 1},
+    ])
+    assert merged == {
+        'files': ['a', 'b'], 'errors': {'a': 'x'},
+        'folder': ['one', 'two'], 'v': 1}
+
+
+def test_reader_values_across_chunks(tmp_path):
+    records = [
+        {"file": 'a "[{\\"}]', "faces": {"note": "\\\\", "x": ["}", "\\"]}},
+        "end \\\" ]",
+        [[], {}, [{"a": "\\u00fc"}]],
+    ]
+    path = write_results(tmp_path, records)
+    for chunk in range(1, 10):
+        offsets = []
+        reader = RecordReader(path, offsets=offsets, chunk=chunk)
+        assert list(reader) == records
+        assert [read_record(path, *span) for span in offsets] == records
+
+
+def test_reader_decodes_large_values_once(tmp_path):
+    records = [{"file": str(i), "faces": {"region": list(range(2000))}}
+               for i in range(3)]
+    path = write_results(tmp_path, records)
+    reader = RecordReader(path, chunk=64)
+    decoder = reader._decoder
+    calls = []
+
+    class Counting:
+        def raw_decode(self, text, pos):
+            calls.append(text[pos])
+            return decoder.raw_decode(text, pos)
+
+    reader._decoder = Counting()
+    assert list(reader) == records
+    # Each record spans over a hundred chunks, but is decoded at most
+    # once when cut off and once complete.
+    assert calls.count('{') <= 2 * len(records) + 1
+
+
+def test_reader_invalid_record(tmp_path):
+    path = tmp_path / "task.json"
+    path.write_text('{"output": [{"a": [1, 2,]}, {"b": 2}], "metadata": {}}')
+    with pytest.raises(json.JSONDecodeError):
+        list(RecordReader(path, chunk=4))
@@ -0,0 +1,119 @@
+import json
+
+import pytest
+from PIL import Image
+
+from datacanvas import worker
+
+from datacanvas.utils import read_columns
+from datacanvas.worker import (ANALYZERS, find_images, register, run_task,
+                               write_results)
+
+
+class Plain:
+    """Analyzer finding one face per image, without a confidence."""
+
+    def __init__(self, flag):
+        pass
+
+    def __call__(self, image, path):
+        return [{'age': image.width}]
+
+
+def test_run_task(tmp_path, make_images):
+    make_images(tmp_path / 'data', count=5)
+    (tmp_path / 'data' / 'notes.txt').write_text('not an image')
+    (tmp_path / 'data' / 'broken.png').write_bytes(b'not a png')
+    flag = {
+        'folder': str(tmp_path / 'data'), 'confidence': 0.0,
+        'emotion': False, 'workers': 2, 'batch': 2,
+    }
+    out = tmp_path / 'out' / 'task.json'
+    metadata = run_task(flag, str(out))
+
+    assert len(metadata['files']) == 6
+    assert list(metadata['errors']) == [str(tmp_path / 'data' / 'broken.png')]
+    columns, fields = read_columns(out)
+    assert columns['file'] == find_images(flag['folder'])[:-1]
+    assert 'faces.dominant_emotion' not in columns
+    assert fields['metadata']['folder'] == flag['folder']
+
+    # The built-in analyzer is deterministic.
+    first = json.loads(out.read_text())['output']
+    run_task(flag, str(out))
+    assert json.loads(out.read_text())['output'] == first
+
+
+def test_incremental_and_resumed_runs(tmp_path, make_images):
+    make_images(tmp_path / 'data', count=6)
+    flag = {'folder': str(tmp_path / 'data'), 'workers': 1, 'batch': 2}
+    out = str(tmp_path / 'task.json')
+
+    # Interrupt after the first batch, then resume.
+    calls = []
+    assert run_task(flag, out, lambda *args: calls.append(args),
+                    lambda: bool(calls)) is None
+    totals = []
+    run_task(flag, out, lambda done, total: totals.append(total))
+    assert totals[-1] == 4
+
+    # Only new or changed images are analyzed on a re-run.
+    Image.new('RGB', (30, 30)).save(tmp_path / 'data' / 'new.jpg')
+    Image.new('RGB', (31, 30)).save(tmp_path / 'data' / '0.jpg')
+    totals = []
+    run_task(flag, out, lambda done, total: totals.append(total))
+    assert totals[-1] == 2
+
+    columns, _ = read_columns(out)
+    assert sorted(columns['file']) == find_images(flag['folder'])
+    assert columns['faces.region.w'][columns['file'].index(
+        str(tmp_path / 'data' / '0.jpg'))] == 31
+
+
+def test_rerun_with_other_settings(tmp_path, make_images):
+    make_images(tmp_path / 'data', count=4)
+    flag = {'folder': str(tmp_path / 'data'), 'workers': 1, 'hash': True}
+    out = str(tmp_path / 'task.json')
+    run_task(flag, out)
+    manifest = json.loads((tmp_path / 'task.json.manifest.json').read_text())
+    assert all('hash' in key for key in manifest['files'].values())
+
+    # Other analysis options invalidate the checkpoint, others do not.
+    for changed, analyzed in ((
+            {'workers': 2}, None), ({'emotion': False}, 4), ({}, None)):
+        flag.update(changed)
+        totals = []
+        run_task(flag, out, lambda done, total: totals.append(total))
+        assert (totals[-1] if totals else None) == analyzed
+    columns, fields = read_columns(out)
+    assert 'faces.dominant_emotion' not in columns
+    assert fields['metadata']['flag']['emotion'] is False
+
+
+def test_analyzer_registered_at_runtime(tmp_path, make_images):
+    make_images(tmp_path / 'data', count=2)
+    register('plain')(Plain)
+    flag = {
+        'folder': str(tmp_path / 'data'), 'analyzer': 'plain',
+        'confidence': 0.5, 'workers': 1,
+    }
+    out = tmp_path / 'task.json'
+    try:
+        metadata = run_task(flag, str(out))
+    finally:
+        del ANALYZERS['plain']
+
+    assert not metadata['errors']
+    output = json.loads(out.read_text())['output']
+    assert [record['faces'] for record in output] == [
+        {'age': 64}, {'age': 65}]
+
+
+def test_write_results_unopened_file(tmp_path, monkeypatch):
+    def denied(*args, **kwargs):
+        raise PermissionError('denied')
+
+    monkeypatch.setattr(worker, 'open', denied, raising=False)
+    with pytest.raises(PermissionError):
+        write_results(str(tmp_path / 'output.json'), {}, [])
+    assert list(tmp_path.iterdir()) == []